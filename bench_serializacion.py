@@ -0,0 +1,93 @@
+"""Microbenchmark: serialización de 10k órdenes, ruta anterior vs. RespuestaJSON.
+
+    python bench_serializacion.py --docs 10000 --repeticiones 5
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from serializacion import RespuestaJSON
+
+
+def serialize_doc_anterior(doc):
+    """Copia de la conversión recursiva que usaba main.py antes de RespuestaJSON."""
+    def convert(value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        elif isinstance(value, list):
+            return [convert(item) for item in value]
+        elif isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        else:
+            return value
+
+    return {k: convert(v) for k, v in doc.items()}
+
+
+def generar_ordenes(n):
+    ahora = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "usuario_id": ObjectId(),
+            "restaurante_id": ObjectId(),
+            "fecha": ahora - timedelta(minutes=random.randint(0, 525600)),
+            "estado": random.choice(["Pendiente", "Preparando", "Entregado"]),
+            "pedido": [
+                {
+                    "articuloId": ObjectId(),
+                    "nombre": f"Artículo {random.randint(1, 500)}",
+                    "cantidad": random.randint(1, 3),
+                    "precio": random.randint(30, 150),
+                }
+                for _ in range(random.randint(1, 4))
+            ],
+            "total": random.randint(30, 600),
+            "restaurante_nombre": "Restaurante de prueba",
+        }
+        for _ in range(n)
+    ]
+
+
+def ruta_anterior(docs):
+    contenido = jsonable_encoder([serialize_doc_anterior(d) for d in docs])
+    return JSONResponse(contenido).body
+
+
+def ruta_nueva(docs):
+    return RespuestaJSON(docs).body
+
+
+def medir(nombre, func, docs, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cuerpo = func(docs)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+    print(f"  {nombre:10s} {mejor * 1000:9.1f} ms  ({len(cuerpo) / 1e6:.1f} MB)")
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    docs = generar_ordenes(args.docs)
+    print(f"{args.docs} órdenes, mejor de {args.repeticiones}:")
+    antes = medir("anterior", ruta_anterior, docs, args.repeticiones)
+    despues = medir("nueva", ruta_nueva, docs, args.repeticiones)
+    print(f"  aceleración: {antes / despues:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Prueba de carga de la API: mezcla de rutas, throughput y latencias p50/p95/p99.
+
+Siembra (opcional) una base local con ``generador.py``, lanza una mezcla
+ponderada de peticiones contra un servidor en marcha y escribe los resultados
+por ruta en un JSON para comparar entre commits:
+
+    uvicorn main:app --port 8000            # en otra terminal
+    python benchmark.py --sembrar --etiqueta base --salida bench-base.json
+
+    git checkout <commit_nuevo>             # reiniciar uvicorn
+    python benchmark.py --etiqueta nuevo --salida bench-nuevo.json --comparar bench-base.json
+
+``--sembrar`` vacía las colecciones de ``--db`` en ``--uri``: usar solo contra
+una base de pruebas. Si ningún artículo tiene imagen, se sube una de prueba
+para que la ruta ``GET /imagenes/{id}`` tenga algo que servir.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+import httpx
+
+# Peso relativo de cada ruta en la mezcla (se puede cambiar con --mezcla)
+MEZCLA = {
+    "menu": 30,
+    "mejores": 10,
+    "resenas": 25,
+    "crear_orden": 15,
+    "imagen": 20,
+    # Página de usuario: endpoint combinado contra las cuatro llamadas que
+    # reemplaza (fuera de la mezcla por defecto, p. ej. --mezcla panel=1,panel_separado=1,...)
+    "panel": 0,
+    "panel_separado": 0,
+}
+
+RUTAS = {
+    "menu": "GET /restaurantes/{id}/menu",
+    "mejores": "GET /restaurantes/mejor_calificados",
+    "resenas": "GET /reseñas",
+    "crear_orden": "POST /ordenes",
+    "imagen": "GET /imagenes/{id}",
+    "panel": "GET /usuarios/{id}/panel",
+    "panel_separado": "GET panel en 4 llamadas",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+# ---------------------------------------------------------------------------
+# Preparación
+# ---------------------------------------------------------------------------
+
+def sembrar(args):
+    """Carga datos reproducibles con generador.py (vacía las colecciones antes)."""
+    comando = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "generador.py"),
+        "--uri", args.uri, "--db", args.db, "--limpiar",
+        "--semilla", str(args.semilla), "--perfil", args.perfil,
+        "--restaurantes", str(args.restaurantes), "--usuarios", str(args.usuarios),
+        "--articulos", str(args.articulos), "--ordenes", str(args.ordenes),
+        "--resenas", str(args.resenas),
+    ]
+    print("Sembrando:", " ".join(comando[1:]))
+    subprocess.run(comando, check=True)
+
+
+def png_de_prueba(lado=256):
+    """PNG en escala de grises con ruido (no comprime: tamaño ~ lado²)."""
+    aleatorio = random.Random(lado)
+    filas = b"".join(
+        b"\x00" + bytes(aleatorio.getrandbits(8) for _ in range(lado)) for _ in range(lado)
+    )
+
+    def bloque(tipo, datos):
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(
+            ">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + bloque(b"IHDR", struct.pack(">IIBBBBB", lado, lado, 8, 0, 0, 0, 0))
+        + bloque(b"IDAT", zlib.compress(filas))
+        + bloque(b"IEND", b"")
+    )
+
+
+async def preparar(cliente, muestra):
+    """Reúne ids reales (restaurantes, artículos, usuarios, imágenes) para la mezcla."""
+    resp = await cliente.get("/restaurantes", params={"limite": min(muestra, 100), "sort_por": "_id"})
+    resp.raise_for_status()
+    restaurantes = [r["_id"] for r in resp.json()]
+    resp = await cliente.get("/usuarios", params={"limite": muestra})
+    resp.raise_for_status()
+    usuarios = [u["_id"] for u in resp.json()]
+    if not restaurantes or not usuarios:
+        raise SystemExit("La base está vacía: usar --sembrar o cargar datos con generador.py")
+
+    menus, imagenes = {}, []
+    for restaurante_id in restaurantes:
+        resp = await cliente.get(f"/restaurantes/{restaurante_id}/menu")
+        resp.raise_for_status()
+        articulos = resp.json()
+        if articulos:
+            menus[restaurante_id] = articulos
+            imagenes += [a["imagen_id"] for a in articulos if a.get("imagen_id")]
+
+    if not imagenes and menus:
+        articulo = next(iter(menus.values()))[0]
+        resp = await cliente.post(
+            f"/articulos/{articulo['_id']}/imagen",
+            files={"file": ("benchmark.png", png_de_prueba(), "image/png")},
+        )
+        resp.raise_for_status()
+        imagenes.append(resp.json()["imagen_id"])
+
+    return {"restaurantes": restaurantes, "usuarios": usuarios, "menus": menus, "imagenes": imagenes}
+
+
+def peticiones(datos):
+    """Funciones ``(cliente, aleatorio) -> respuesta`` por ruta de la mezcla."""
+    con_menu = list(datos["menus"])
+
+    def menu(cliente, aleatorio):
+        return cliente.get(f"/restaurantes/{aleatorio.choice(datos['restaurantes'])}/menu")
+
+    def mejores(cliente, aleatorio):
+        return cliente.get("/restaurantes/mejor_calificados")
+
+    def resenas(cliente, aleatorio):
+        params = {"limite": 20, "restaurante_id": aleatorio.choice(datos["restaurantes"])}
+        return cliente.get("/reseñas", params=params)
+
+    def crear_orden(cliente, aleatorio):
+        restaurante_id = aleatorio.choice(con_menu)
+        articulos = aleatorio.sample(datos["menus"][restaurante_id], k=min(3, len(datos["menus"][restaurante_id])))
+        orden = {
+            "usuario_id": aleatorio.choice(datos["usuarios"]),
+            "restaurante_id": restaurante_id,
+            "pedido": [
+                {"articuloId": a["_id"], "cantidad": aleatorio.randint(1, 3), "precio": a.get("precio", 0)}
+                for a in articulos
+            ],
+        }
+        return cliente.post("/ordenes", json=orden)
+
+    def imagen(cliente, aleatorio):
+        return cliente.get(f"/imagenes/{aleatorio.choice(datos['imagenes'])}")
+
+    def panel(cliente, aleatorio):
+        return cliente.get(f"/usuarios/{aleatorio.choice(datos['usuarios'])}/panel")
+
+    async def panel_separado(cliente, aleatorio):
+        # Como lo hacía la página de usuario: cuatro llamadas en paralelo; la
+        # muestra dura lo que la más lenta y falla si falla cualquiera
+        usuario_id = aleatorio.choice(datos["usuarios"])
+        respuestas = await asyncio.gather(
+            cliente.get(f"/usuarios/{usuario_id}"),
+            cliente.get(f"/usuarios/{usuario_id}/favoritos"),
+            cliente.get(f"/usuarios/{usuario_id}/ordenes"),
+            cliente.get("/reseñas", params={"usuario_id": usuario_id, "limite": 5}),
+        )
+        return max(respuestas, key=lambda r: r.status_code)
+
+    funciones = {
+        "menu": menu, "mejores": mejores, "resenas": resenas,
+        "crear_orden": crear_orden, "imagen": imagen,
+        "panel": panel, "panel_separado": panel_separado,
+    }
+    if not con_menu:
+        del funciones["crear_orden"]
+    if not datos["imagenes"]:
+        del funciones["imagen"]
+    return funciones
+
+
+# ---------------------------------------------------------------------------
+# Medición
+# ---------------------------------------------------------------------------
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return None
+    indice = max(0, -(-p * len(ordenados) // 100) - 1)
+    return ordenados[indice]
+
+
+async def trabajador(cliente, funciones, pesos, aleatorio, inicio_medicion, fin, muestras):
+    nombres = list(pesos)
+    ponderacion = list(pesos.values())
+    while True:
+        ahora = time.perf_counter()
+        if ahora >= fin:
+            return
+        nombre = aleatorio.choices(nombres, ponderacion)[0]
+        try:
+            resp = await funciones[nombre](cliente, aleatorio)
+            await resp.aread()
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        terminado = time.perf_counter()
+        if ahora >= inicio_medicion:  # se descartan las del calentamiento
+            muestras[nombre].append((terminado - ahora, ok))
+
+
+def resumir(muestras, transcurrido):
+    resultado = {}
+    for nombre, lista in muestras.items():
+        latencias = sorted(t for t, ok in lista if ok)
+        errores = sum(1 for _, ok in lista if not ok)
+        resultado[RUTAS[nombre]] = {
+            "peticiones": len(lista),
+            "errores": errores,
+            "req_s": round(len(latencias) / transcurrido, 2),
+            **{
+                f"p{p}_ms": round(percentil(latencias, p) * 1000, 2) if latencias else None
+                for p in PERCENTILES
+            },
+            "media_ms": round(sum(latencias) / len(latencias) * 1000, 2) if latencias else None,
+            "max_ms": round(latencias[-1] * 1000, 2) if latencias else None,
+        }
+    return resultado
+
+
+async def correr(args, pesos):
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=30) as cliente:
+        datos = await preparar(cliente, args.muestra)
+        funciones = peticiones(datos)
+        pesos = {n: w for n, w in pesos.items() if n in funciones and w > 0}
+
+        muestras = {nombre: [] for nombre in pesos}
+        inicio = time.perf_counter()
+        inicio_medicion = inicio + args.calentamiento
+        fin = inicio_medicion + args.duracion
+        await asyncio.gather(*(
+            trabajador(
+                cliente, funciones, pesos, random.Random(args.semilla + i),
+                inicio_medicion, fin, muestras,
+            )
+            for i in range(args.concurrencia)
+        ))
+    return resumir(muestras, args.duracion)
+
+
+# ---------------------------------------------------------------------------
+# Reporte
+# ---------------------------------------------------------------------------
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(rutas):
+    print(f"  {'ruta':38s} {'req/s':>9s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'errores':>8s}")
+    for ruta, r in rutas.items():
+        p = [f"{r[f'p{x}_ms']:8.1f}" if r[f"p{x}_ms"] is not None else f"{'-':>8s}" for x in PERCENTILES]
+        print(f"  {ruta:38s} {r['req_s']:9.1f} {' '.join(p)} {r['errores']:8d}")
+
+
+def comparar(rutas, archivo_base):
+    with open(archivo_base, encoding="utf-8") as f:
+        base = json.load(f)
+    print(f"\nComparado con {base.get('etiqueta')} ({base.get('commit')}):")
+    print(f"  {'ruta':38s} {'req/s':>9s} {'p95':>9s} {'p99':>9s}")
+    for ruta, r in rutas.items():
+        anterior = base["rutas"].get(ruta)
+        if not anterior:
+            continue
+        cambios = []
+        for clave in ("req_s", "p95_ms", "p99_ms"):
+            if r[clave] is None or not anterior.get(clave):
+                cambios.append(f"{'-':>9s}")
+            else:
+                cambios.append(f"{(r[clave] / anterior[clave] - 1) * 100:+8.1f}%")
+        print(f"  {ruta:38s} {' '.join(cambios)}")
+
+
+def leer_mezcla(texto):
+    pesos = dict(MEZCLA)
+    if texto:
+        for parte in texto.split(","):
+            nombre, _, peso = parte.partition("=")
+            if nombre.strip() not in MEZCLA:
+                raise SystemExit(f"Ruta desconocida en --mezcla: {nombre} (opciones: {', '.join(MEZCLA)})")
+            pesos[nombre.strip()] = float(peso)
+    return pesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--duracion", type=float, default=30.0, help="Segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=5.0, help="Segundos descartados al inicio")
+    parser.add_argument("--mezcla", help="Pesos por ruta, p. ej. menu=50,imagen=0 (rutas: %s)" % ", ".join(MEZCLA))
+    parser.add_argument("--muestra", type=int, default=100, help="Restaurantes/usuarios usados como ids")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--etiqueta", default="actual")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto bench-<etiqueta>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para mostrar la diferencia")
+
+    siembra = parser.add_argument_group("siembra (--sembrar vacía la base indicada)")
+    siembra.add_argument("--sembrar", action="store_true")
+    siembra.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    siembra.add_argument("--db", default="Proyecto")
+    siembra.add_argument("--perfil", default="realista")
+    siembra.add_argument("--restaurantes", type=int, default=1000)
+    siembra.add_argument("--usuarios", type=int, default=5000)
+    siembra.add_argument("--articulos", type=int, default=10000)
+    siembra.add_argument("--ordenes", type=int, default=100000)
+    siembra.add_argument("--resenas", type=int, default=20000)
+    args = parser.parse_args()
+
+    pesos = leer_mezcla(args.mezcla)
+    if args.sembrar:
+        sembrar(args)
+
+    print(f"[{args.etiqueta}] concurrencia={args.concurrencia} duracion={args.duracion}s "
+          f"calentamiento={args.calentamiento}s")
+    rutas = asyncio.run(correr(args, pesos))
+    imprimir(rutas)
+
+    reporte = {
+        "etiqueta": args.etiqueta,
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "url": args.url,
+        "concurrencia": args.concurrencia,
+        "duracion_s": args.duracion,
+        "mezcla": pesos,
+        "total_req_s": round(sum(r["req_s"] for r in rutas.values()), 2),
+        "rutas": rutas,
+    }
+    salida = args.salida or f"bench-{args.etiqueta}.json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {salida}")
+
+    if args.comparar:
+        comparar(rutas, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Búsqueda por prefijo (typeahead) de restaurantes y artículos.
+
+Cada documento guarda dos campos derivados de su texto, sin acentos y en
+minúsculas:
+
+- ``nombre_normalizado``: el nombre completo ("cafe la selva").
+- ``busqueda``: las palabras del nombre (y de la descripción, en artículos).
+
+Ambos están indexados (ver indices.py), así que una búsqueda es un rango de
+índice con una expresión regular anclada (``^piz``) y no un recorrido de la
+colección. Primero se buscan nombres que empiezan con el texto completo y,
+si faltan resultados, documentos con alguna palabra que empiece con cada
+término; el orden final favorece esa misma jerarquía y los nombres cortos.
+
+Los endpoints de escritura mantienen los campos al día con ``campos_busqueda``
+y cada worker completa al arrancar los documentos que no los tienen. Para
+recalcularlos todos (p. ej. tras cambiar ``normalizar``):
+
+    python busqueda.py --uri mongodb://localhost:27017
+"""
+
+import argparse
+import os
+import re
+import unicodedata
+
+from pymongo import MongoClient, UpdateOne
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+# Las palabras más cortas no se indexan en ``busqueda``
+MIN_LARGO_PALABRA = 2
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con cualquier separador reducido a un espacio."""
+    if not texto:
+        return ""
+    descompuesto = unicodedata.normalize("NFKD", str(texto).casefold())
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(" ", sin_acentos).strip()
+
+
+def palabras(*textos):
+    vistas = {}
+    for texto in textos:
+        for palabra in normalizar(texto).split():
+            if len(palabra) >= MIN_LARGO_PALABRA:
+                vistas.setdefault(palabra, None)
+    return list(vistas)
+
+
+def campos_busqueda(nombre, descripcion=None):
+    """Campos derivados a guardar (con ``$set``) junto a ``nombre``/``descripcion``."""
+    return {
+        "nombre_normalizado": normalizar(nombre),
+        "busqueda": palabras(nombre, descripcion),
+    }
+
+
+# Se omiten de las respuestas: son detalle interno de la búsqueda
+SIN_CAMPOS_BUSQUEDA = {"nombre_normalizado": 0, "busqueda": 0}
+
+
+def _prefijo(texto):
+    # Anclada y sin opciones: Mongo la resuelve como un rango del índice
+    return re.compile("^" + re.escape(texto))
+
+
+def filtro_palabras(texto):
+    """Filtro de documentos con una palabra que empieza con cada término de ``texto``."""
+    terminos = normalizar(texto).split()
+    if not terminos:
+        return {}
+    return {"busqueda": {"$all": [_prefijo(t) for t in terminos]}}
+
+
+async def buscar(coleccion, texto, limite=10, filtro=None, projection=None):
+    """Hasta ``limite`` documentos de ``coleccion`` (``ColeccionAsync``) que coinciden con ``texto``.
+
+    Hace a lo sumo dos consultas indexadas: nombres que empiezan con el texto
+    y, si no alcanzan, documentos con palabras que empiezan con cada término.
+    """
+    consulta = normalizar(texto)
+    if not consulta:
+        return []
+    filtro = filtro or {}
+    # nombre_normalizado se pide siempre para ordenar y se quita al final
+    if projection and any(v for k, v in projection.items() if k != "_id"):
+        projection = {**projection, "nombre_normalizado": 1}
+    else:
+        projection = {**(projection or {}), "busqueda": 0}
+
+    por_nombre = await coleccion.find(
+        {**filtro, "nombre_normalizado": _prefijo(consulta)},
+        projection=projection,
+        sort=[("nombre_normalizado", 1)],
+        limit=limite,
+    )
+    resultados = {doc["_id"]: doc for doc in por_nombre}
+
+    if len(resultados) < limite:
+        por_palabra = await coleccion.find(
+            {**filtro, "_id": {"$nin": list(resultados)}, **filtro_palabras(consulta)},
+            projection=projection,
+            # Candidatos de más para que el orden final elija los mejores
+            limit=(limite - len(resultados)) * 3,
+        )
+        for doc in por_palabra:
+            resultados.setdefault(doc["_id"], doc)
+
+    ordenados = sorted(resultados.values(), key=lambda d: _puntaje(d, consulta))[:limite]
+    for doc in ordenados:
+        doc.pop("nombre_normalizado", None)
+    return ordenados
+
+
+def _puntaje(doc, consulta):
+    nombre = doc.get("nombre_normalizado", "")
+    if nombre.startswith(consulta):
+        nivel = 0
+    elif all(any(p.startswith(t) for p in nombre.split()) for t in consulta.split()):
+        nivel = 1  # todas las palabras buscadas están en el nombre
+    else:
+        nivel = 2  # coincide por la descripción
+    return nivel, len(nombre), nombre
+
+
+def completar(db, tamano_lote=1000, solo_faltantes=False):
+    """Calcula los campos de búsqueda de todos los restaurantes y artículos.
+
+    Con ``solo_faltantes`` se limita a los documentos que nunca los tuvieron
+    (lo que hace ``conexion.calentar`` al arrancar cada worker).
+    """
+    filtro = {"nombre_normalizado": {"$exists": False}} if solo_faltantes else {}
+    totales = {}
+    for coleccion, campos in (("restaurantes", ("nombre",)), ("articulos", ("nombre", "descripcion"))):
+        operaciones, total = [], 0
+        for doc in db[coleccion].find(filtro, {campo: 1 for campo in campos}):
+            operaciones.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": campos_busqueda(*(doc.get(campo) for campo in campos))},
+            ))
+            if len(operaciones) == tamano_lote:
+                total += db[coleccion].bulk_write(operaciones, ordered=False).modified_count
+                operaciones = []
+        if operaciones:
+            total += db[coleccion].bulk_write(operaciones, ordered=False).modified_count
+        totales[coleccion] = total
+    return totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Completa los campos de búsqueda existentes.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="Proyecto")
+    args = parser.parse_args()
+
+    totales = completar(MongoClient(args.uri)[args.db])
+    for coleccion, total in totales.items():
+        print(f"  {coleccion:12s}: {total:,} documentos actualizados")
+
+
+if __name__ == "__main__":
+    main()
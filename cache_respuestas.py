@@ -0,0 +1,142 @@
+"""Caché de lectura (TTL + LRU) para respuestas de restaurantes, menús y artículos.
+
+Guarda el JSON ya serializado de cada respuesta bajo una clave de ruta y
+parámetros, con un conjunto de etiquetas (``("restaurante", id)``,
+``("menu", id)``, ``("articulo", id)``). Las escrituras invalidan por etiqueta,
+así que solo se descartan las respuestas que pueden haber cambiado.
+
+El caché es por proceso: con varios workers, lo que escribe uno no invalida a
+los demás y cada uno puede servir datos viejos hasta ``CACHE_RESPUESTAS_TTL``
+segundos. El tamaño total se acota a ``CACHE_RESPUESTAS_MB``.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from fastapi import Response
+
+from serializacion import a_json
+
+
+class CacheRespuestas:
+    """LRU de respuestas JSON con vencimiento, acotado por bytes totales."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes_usados = 0
+        # Cambia en cada invalidación: una lectura que empezó antes no guarda
+        # su resultado, porque pudo leer datos previos a la escritura.
+        self.generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.invalidaciones = 0
+        self._entradas = OrderedDict()  # clave -> (vence, contenido, etiquetas)
+        self._por_etiqueta = {}
+
+    def obtener(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada[0] < time.monotonic():
+            self._quitar(clave)
+            entrada = None
+        if entrada is None:
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return entrada[1]
+
+    def guardar(self, clave, contenido, etiquetas, generacion):
+        if generacion != self.generacion or len(contenido) > self.max_bytes:
+            return
+        if clave in self._entradas:
+            self._quitar(clave)
+        self._entradas[clave] = (time.monotonic() + self.ttl, contenido, etiquetas)
+        self.bytes_usados += len(contenido)
+        for etiqueta in etiquetas:
+            self._por_etiqueta.setdefault(etiqueta, set()).add(clave)
+        while self.bytes_usados > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+            self.expulsiones += 1
+
+    def invalidar(self, *etiquetas):
+        self.generacion += 1
+        for etiqueta in etiquetas:
+            for clave in self._por_etiqueta.pop(etiqueta, ()):
+                if clave in self._entradas:
+                    self._quitar(clave)
+                    self.invalidaciones += 1
+
+    def _quitar(self, clave):
+        _, contenido, etiquetas = self._entradas.pop(clave)
+        self.bytes_usados -= len(contenido)
+        for etiqueta in etiquetas:
+            claves = self._por_etiqueta.get(etiqueta)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_etiqueta[etiqueta]
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self.bytes_usados,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None,
+            "expulsiones": self.expulsiones,
+            "invalidaciones": self.invalidaciones,
+        }
+
+
+cache_respuestas = CacheRespuestas(
+    max_bytes=int(float(os.environ.get("CACHE_RESPUESTAS_MB", "32")) * 1024 * 1024),
+    ttl=float(os.environ.get("CACHE_RESPUESTAS_TTL", "30")),
+)
+
+
+async def leer_con_cache(clave, etiquetas, cargar):
+    """Devuelve la respuesta de ``clave`` desde el caché o llamando a ``cargar()``.
+
+    ``cargar`` es una corrutina que devuelve el contenido a serializar; si lanza
+    (p. ej. ``HTTPException`` 404) no se guarda nada.
+    """
+    contenido = cache_respuestas.obtener(clave)
+    estado = "HIT"
+    if contenido is None:
+        generacion = cache_respuestas.generacion
+        contenido = a_json(await cargar())
+        cache_respuestas.guardar(clave, contenido, etiquetas, generacion)
+        estado = "MISS"
+    return Response(content=contenido, media_type="application/json", headers={"X-Cache": estado})
+
+
+def id_canonico(valor):
+    """Id en la forma de ``str(ObjectId)``, para claves y etiquetas.
+
+    Un id de la ruta en mayúsculas es el mismo documento: si entrara tal cual
+    a la clave, su entrada no tendría la etiqueta que usa la invalidación.
+    """
+    return str(ObjectId(valor))
+
+
+def invalidar_restaurante(restaurante_id):
+    cache_respuestas.invalidar(("restaurante", id_canonico(restaurante_id)))
+
+
+def invalidar_menu(restaurante_id):
+    cache_respuestas.invalidar(("menu", id_canonico(restaurante_id)))
+
+
+def invalidar_articulo(articulo):
+    """Invalida el artículo y el menú de su restaurante (``articulo`` es el documento)."""
+    etiquetas = [("articulo", id_canonico(articulo["_id"]))]
+    if articulo.get("restaurante_id") is not None:
+        etiquetas.append(("menu", id_canonico(articulo["restaurante_id"])))
+    cache_respuestas.invalidar(*etiquetas)
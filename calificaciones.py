@@ -0,0 +1,116 @@
+"""Estadísticas de calificación por restaurante, mantenidas de forma incremental.
+
+La colección ``calificaciones`` guarda un documento por restaurante
+(``_id`` = id del restaurante) con ``total``, ``suma``, ``promedio`` y un
+``histograma`` de puntajes 1–5. Los endpoints de reseñas la ajustan en cada
+escritura, de modo que el ranking y la calificación de un restaurante son
+lecturas indexadas en lugar de un ``$group`` sobre todas las reseñas.
+
+Al arrancar, ``conexion.calentar`` la reconstruye si está vacía (primer
+despliegue sobre reseñas existentes). Si las estadísticas se desincronizan
+(cargas directas a Mongo, fallos a mitad de una escritura) se reconstruyen
+desde ``reseñas``:
+
+    python calificaciones.py --uri mongodb://localhost:27017
+"""
+
+import argparse
+import os
+
+from pymongo import MongoClient, ReturnDocument
+
+PUNTAJES = (1, 2, 3, 4, 5)
+
+
+def calificacion_vacia(restaurante_id):
+    return {
+        "_id": restaurante_id,
+        "total": 0,
+        "suma": 0,
+        "promedio": None,
+        "histograma": {str(p): 0 for p in PUNTAJES},
+    }
+
+
+def puntaje_valido(puntaje):
+    return isinstance(puntaje, int) and not isinstance(puntaje, bool) and puntaje in PUNTAJES
+
+
+def completar_histograma(calificacion):
+    """Agrega al histograma los puntajes en 0 (los ``$inc`` solo crean los que suman)."""
+    calificacion["histograma"] = {
+        **calificacion_vacia(None)["histograma"], **calificacion.get("histograma", {})
+    }
+    return calificacion
+
+
+async def ajustar_calificacion(db, restaurante_id, puntaje, signo):
+    """Suma (``signo=1``) o resta (``signo=-1``) una reseña a las estadísticas.
+
+    Las reseñas sin un puntaje de ``PUNTAJES`` (datos antiguos) no cuentan,
+    igual que en ``reconstruir_calificaciones``.
+    """
+    if not puntaje_valido(puntaje):
+        return
+    doc = await db.calificaciones.find_one_and_update(
+        {"_id": restaurante_id},
+        {
+            "$inc": {
+                "total": signo,
+                "suma": signo * puntaje,
+                f"histograma.{puntaje}": signo,
+            }
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    promedio = doc["suma"] / doc["total"] if doc["total"] > 0 else None
+    # Solo se escribe si nadie más modificó el documento entretanto; en ese caso
+    # la otra escritura ya deja el promedio correcto.
+    await db.calificaciones.update_one(
+        {"_id": restaurante_id, "total": doc["total"], "suma": doc["suma"]},
+        {"$set": {"promedio": promedio}},
+    )
+
+
+def reconstruir_calificaciones(db):
+    """Recalcula toda la colección ``calificaciones`` a partir de ``reseñas``."""
+    histograma = {
+        str(p): {"$sum": {"$cond": [{"$eq": ["$puntaje", p]}, 1, 0]}} for p in PUNTAJES
+    }
+    pipeline = [
+        {"$match": {"puntaje": {"$in": list(PUNTAJES)}}},
+        {
+            "$group": {
+                "_id": "$restaurante_id",
+                "total": {"$sum": 1},
+                "suma": {"$sum": "$puntaje"},
+                **{f"h{p}": expr for p, expr in histograma.items()},
+            }
+        },
+        {
+            "$project": {
+                "total": 1,
+                "suma": 1,
+                "promedio": {"$divide": ["$suma", "$total"]},
+                "histograma": {p: f"$h{p}" for p in histograma},
+            }
+        },
+        {"$out": "calificaciones"},
+    ]
+    db.reseñas.aggregate(pipeline)
+    return db.calificaciones.count_documents({})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye las estadísticas de calificación.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="Proyecto")
+    args = parser.parse_args()
+
+    total = reconstruir_calificaciones(MongoClient(args.uri)[args.db])
+    print(f"Calificaciones reconstruidas para {total:,} restaurantes")
+
+
+if __name__ == "__main__":
+    main()
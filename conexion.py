@@ -0,0 +1,221 @@
+"""Cliente de Mongo por proceso: configuración por entorno y calentamiento.
+
+main.py crea el cliente dentro del ``lifespan`` de FastAPI, es decir, una vez
+por worker y después del fork. Un ``MongoClient`` creado al importar el módulo
+quedaría compartido entre procesos si el servidor importa la app antes de
+bifurcar (``gunicorn --preload``), y pymongo no es seguro ante ``fork``.
+
+Variables de entorno (todas opcionales):
+
+    MONGO_URI                           cadena de conexión
+    MONGO_DB                            base de datos (Proyecto)
+    MONGO_MAX_POOL / MONGO_MIN_POOL     conexiones por worker (50 / 5)
+    MONGO_MAX_IDLE_MS                   cierre de conexiones ociosas (300000)
+    MONGO_CONNECT_TIMEOUT_MS            (5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   (10000)
+    MONGO_SOCKET_TIMEOUT_MS             (30000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS         espera máxima por una conexión libre (5000)
+    MONGO_COMPRESORES                   p. ej. "zstd,snappy,zlib" (zlib)
+
+Antes de que el worker acepte peticiones, ``calentar`` hace un ``ping``, abre
+``MONGO_MIN_POOL`` conexiones, aplica/verifica los índices de indices.py y
+completa los campos de búsqueda que falten (ver busqueda.py), así
+que las primeras peticiones no pagan el establecimiento de conexiones (TLS y
+autenticación incluidos).
+
+Varios workers:
+
+    uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4
+    gunicorn main:app -k uvicorn.workers.UvicornWorker -w 4 --preload -b 0.0.0.0:8000
+
+Cada worker tiene su propio pool: el máximo de conexiones hacia Mongo es
+``workers × MONGO_MAX_POOL``, que debe quedar por debajo del límite del
+clúster. Los cachés en memoria y el feed de órdenes también son por worker.
+
+Lecturas por endpoint: ``LECTURAS`` asigna a cada endpoint un perfil de
+``PERFILES_LECTURA``. Los listados y agregaciones pueden ir a secundarios con
+un atraso acotado (``MONGO_MAX_STALENESS_S``, mínimo 90 s); lo que el usuario
+necesita ver justo después de escribir (estado de una orden, sus órdenes,
+favoritos) y los endpoints con caché de respuestas quedan en el primario, que
+es el perfil por defecto. Se puede cambiar sin tocar código:
+
+    LECTURAS="listar_resenas=primario,listar_ordenes=secundario"
+
+Para verificarlo con un replica set local de tres nodos:
+
+    for p in 27017 27018 27019; do
+        mongod --replSet rs0 --port $p --dbpath /tmp/rs0-$p --fork --logpath /tmp/rs0-$p.log
+    done
+    mongosh --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+    MONGO_URI="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" uvicorn main:app
+
+``mongo_comandos_servidor_total`` en ``/metrics`` muestra a qué nodo fue cada
+comando: ``GET /reseñas`` debe sumar en un secundario y ``GET /ordenes/{id}``
+en el primario.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from busqueda import completar as completar_busqueda
+from calificaciones import reconstruir_calificaciones
+from indices import INDICES, aplicar_indices
+from ventas import reconstruir_ventas
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.environ.get("MONGO_DB", "Proyecto")
+
+
+def _entero(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+def opciones_cliente():
+    """Opciones del pool y de timeouts para ``MongoClient``, tomadas del entorno."""
+    opciones = {
+        "maxPoolSize": _entero("MONGO_MAX_POOL", 50),
+        "minPoolSize": _entero("MONGO_MIN_POOL", 5),
+        "maxIdleTimeMS": _entero("MONGO_MAX_IDLE_MS", 300000),
+        "connectTimeoutMS": _entero("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _entero("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000),
+        "socketTimeoutMS": _entero("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "waitQueueTimeoutMS": _entero("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+    }
+    compresores = os.environ.get("MONGO_COMPRESORES", "zlib").strip()
+    if compresores:
+        opciones["compressors"] = compresores
+    return opciones
+
+
+MAX_STALENESS_S = max(int(os.environ.get("MONGO_MAX_STALENESS_S", "120")), 90)
+
+# perfil -> opciones de with_options()
+PERFILES_LECTURA = {
+    "primario": {"read_preference": Primary(), "read_concern": ReadConcern("local")},
+    "secundario": {
+        "read_preference": SecondaryPreferred(max_staleness=MAX_STALENESS_S),
+        "read_concern": ReadConcern("local"),
+    },
+    # Reportes: solo datos confirmados por la mayoría (no se revierten tras un failover)
+    "analitica": {
+        "read_preference": SecondaryPreferred(max_staleness=MAX_STALENESS_S),
+        "read_concern": ReadConcern("majority"),
+    },
+}
+
+# endpoint (nombre de la función en main.py) -> perfil; los demás usan "primario"
+LECTURAS = {
+    "listar_restaurantes": "secundario",
+    "restaurantes_cercanos": "secundario",
+    "listar_usuarios": "secundario",
+    "listar_resenas": "secundario",
+    "mejores_restaurantes": "analitica",
+    "exportar_ordenes": "analitica",
+    "exportar_resenas": "analitica",
+    "ventas_restaurante": "analitica",
+    "ranking_ventas": "analitica",
+}
+
+
+def _lecturas_del_entorno():
+    """Cambios a ``LECTURAS`` desde la variable de entorno del mismo nombre."""
+    cambios = {}
+    for parte in filter(None, os.environ.get("LECTURAS", "").split(",")):
+        endpoint, _, perfil = parte.partition("=")
+        if perfil.strip() not in PERFILES_LECTURA:
+            raise ValueError(f"Perfil de lectura desconocido en LECTURAS: {parte}")
+        cambios[endpoint.strip()] = perfil.strip()
+    return cambios
+
+
+LECTURAS.update(_lecturas_del_entorno())
+
+
+def bases_por_perfil(db):
+    """``{perfil: BaseDatosAsync}`` con las opciones de lectura de cada perfil."""
+    return {perfil: db.con_opciones(**opciones) for perfil, opciones in PERFILES_LECTURA.items()}
+
+
+def crear_cliente(event_listeners=()):
+    return MongoClient(MONGO_URI, event_listeners=list(event_listeners), **opciones_cliente())
+
+
+def indices_faltantes(db):
+    """Nombres de índices de ``INDICES`` que no existen en la base."""
+    faltantes = []
+    for coleccion, modelos in INDICES.items():
+        existentes = set(db[coleccion].index_information())
+        faltantes += [
+            f"{coleccion}.{m.document['name']}" for m in modelos if m.document["name"] not in existentes
+        ]
+    return faltantes
+
+
+# resumen incremental -> (colección de origen, reconstrucción completa)
+RESUMENES = {
+    "calificaciones": ("reseñas", reconstruir_calificaciones),
+    "ventas_diarias": ("ordenes", reconstruir_ventas),
+}
+
+
+def reconstruir_si_vacio(db, resumen):
+    """Reconstruye ``resumen`` si está vacío y su colección de origen tiene datos.
+
+    Los endpoints solo ajustan los resúmenes con ``$inc``: sin esta primera
+    pasada, los datos anteriores al resumen no cuentan y editar o borrar uno
+    deja totales negativos. Devuelve True si lo reconstruyó.
+    """
+    origen, reconstruir = RESUMENES[resumen]
+    if db[resumen].find_one({}, {"_id": 1}) is not None or db[origen].find_one({}, {"_id": 1}) is None:
+        return False
+    reconstruir(db)
+    return True
+
+
+def calentar(client, db):
+    """Verifica la conexión, abre el pool mínimo y deja los índices listos.
+
+    También completa los campos de búsqueda de documentos que no los tienen
+    (cargados antes de busqueda.py o directo a Mongo) y arma los resúmenes de
+    ``RESUMENES`` que estén vacíos. Un fallo del ``ping`` se propaga (el worker
+    no arranca sin base de datos); los problemas con índices, búsqueda o
+    resúmenes solo se registran.
+    """
+    db.command("ping")
+
+    # Pings simultáneos: cada uno toma una conexión distinta del pool
+    minimo = client.options.pool_options.min_pool_size
+    if minimo > 1:
+        with ThreadPoolExecutor(max_workers=minimo) as hilos:
+            list(hilos.map(lambda _: db.command("ping"), range(minimo)))
+
+    try:
+        aplicar_indices(db)
+        faltantes = indices_faltantes(db)
+        if faltantes:
+            logger.warning("Índices ausentes tras aplicarlos: %s", ", ".join(faltantes))
+    except Exception as e:
+        logger.warning("No se pudieron aplicar los índices: %s", e)
+
+    try:
+        completados = completar_busqueda(db, solo_faltantes=True)
+        if any(completados.values()):
+            logger.info("Campos de búsqueda completados: %s", completados)
+    except Exception as e:
+        logger.warning("No se pudieron completar los campos de búsqueda: %s", e)
+
+    for resumen in RESUMENES:
+        try:
+            if reconstruir_si_vacio(db, resumen):
+                logger.info("Resumen %s reconstruido desde %s", resumen, RESUMENES[resumen][0])
+        except Exception as e:
+            logger.warning("No se pudo reconstruir el resumen %s: %s", resumen, e)
@@ -0,0 +1,148 @@
+"""Capa de acceso a datos no bloqueante para los endpoints async de main.py.
+
+pymongo y GridFS son síncronos: llamarlos directamente desde un ``async def``
+detiene el event loop mientras Mongo responde. Aquí cada operación se ejecuta en
+el threadpool de Starlette, de modo que varias peticiones concurrentes pueden
+solapar sus viajes a la base de datos.
+
+Las consultas que devuelven cursores (``find``, ``aggregate``) se materializan
+dentro del hilo; ``sort``, ``skip`` y ``limit`` se pasan como argumentos de
+``find`` en lugar de encadenarse sobre el cursor.
+"""
+
+from itertools import islice
+
+from starlette.concurrency import run_in_threadpool
+
+
+async def en_hilo(func, *args, **kwargs):
+    """Ejecuta una llamada bloqueante en el threadpool y espera su resultado."""
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+class ColeccionAsync:
+    """Envoltura awaitable sobre una ``pymongo.collection.Collection``."""
+
+    def __init__(self, coleccion):
+        self.sync = coleccion
+
+    @property
+    def name(self):
+        return self.sync.name
+
+    async def find_one(self, *args, **kwargs):
+        return await en_hilo(self.sync.find_one, *args, **kwargs)
+
+    async def find(self, *args, **kwargs):
+        return await en_hilo(lambda: list(self.sync.find(*args, **kwargs)))
+
+    async def iterar_lotes(self, *args, tamano_lote=1000, **kwargs):
+        """Recorre un ``find`` en lotes de ``tamano_lote`` sin materializarlo entero.
+
+        Cada lote se trae en el threadpool; el cursor se cierra al terminar o si
+        el consumidor abandona la iteración (p. ej. el cliente se desconecta).
+        """
+        cursor = self.sync.find(*args, batch_size=tamano_lote, **kwargs)
+        try:
+            while True:
+                lote = await en_hilo(lambda: list(islice(cursor, tamano_lote)))
+                if not lote:
+                    break
+                yield lote
+        finally:
+            await en_hilo(cursor.close)
+
+    async def find_por_ids(self, ids, projection=None):
+        """Resuelve una lista de ``_id`` con un solo ``$in``; devuelve ``{_id: doc}``.
+
+        Los ids repetidos se consultan una sola vez y los que no existen
+        simplemente no aparecen en el mapa.
+        """
+        unicos = list(dict.fromkeys(ids))
+        if not unicos:
+            return {}
+        docs = await self.find({"_id": {"$in": unicos}}, projection=projection)
+        return {doc["_id"]: doc for doc in docs}
+
+    async def aggregate(self, pipeline, **kwargs):
+        return await en_hilo(lambda: list(self.sync.aggregate(pipeline, **kwargs)))
+
+    async def count_documents(self, filtro, **kwargs):
+        return await en_hilo(self.sync.count_documents, filtro, **kwargs)
+
+    async def distinct(self, campo, filtro=None, **kwargs):
+        return await en_hilo(self.sync.distinct, campo, filtro, **kwargs)
+
+    async def insert_one(self, documento, **kwargs):
+        return await en_hilo(self.sync.insert_one, documento, **kwargs)
+
+    async def insert_many(self, documentos, **kwargs):
+        return await en_hilo(self.sync.insert_many, documentos, **kwargs)
+
+    async def update_one(self, filtro, cambios, **kwargs):
+        return await en_hilo(self.sync.update_one, filtro, cambios, **kwargs)
+
+    async def update_many(self, filtro, cambios, **kwargs):
+        return await en_hilo(self.sync.update_many, filtro, cambios, **kwargs)
+
+    async def find_one_and_update(self, filtro, cambios, **kwargs):
+        return await en_hilo(self.sync.find_one_and_update, filtro, cambios, **kwargs)
+
+    async def find_one_and_delete(self, filtro, **kwargs):
+        return await en_hilo(self.sync.find_one_and_delete, filtro, **kwargs)
+
+    async def delete_one(self, filtro, **kwargs):
+        return await en_hilo(self.sync.delete_one, filtro, **kwargs)
+
+    async def delete_many(self, filtro, **kwargs):
+        return await en_hilo(self.sync.delete_many, filtro, **kwargs)
+
+    async def bulk_write(self, operaciones, **kwargs):
+        return await en_hilo(self.sync.bulk_write, operaciones, **kwargs)
+
+
+class BaseDatosAsync:
+    """Acceso por atributo o índice a colecciones envueltas en ``ColeccionAsync``.
+
+    ``db.ordenes`` y ``db["reseñas"]`` devuelven la colección awaitable; la base
+    de datos síncrona queda disponible en ``db.sync`` para scripts y tareas de
+    mantenimiento que no corren dentro del event loop.
+    """
+
+    def __init__(self, base_datos):
+        self.sync = base_datos
+
+    def con_opciones(self, **opciones):
+        """La misma base con otras opciones (``read_preference``, ``read_concern``, ...)."""
+        return BaseDatosAsync(self.sync.with_options(**opciones))
+
+    def __getitem__(self, nombre):
+        return ColeccionAsync(self.sync[nombre])
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return self[nombre]
+
+
+class GridFSAsync:
+    """Envoltura awaitable sobre ``gridfs.GridFS``.
+
+    ``get`` abre el archivo en el threadpool; el ``GridOut`` resultante es un
+    iterador síncrono que ``StreamingResponse`` ya consume fuera del event loop.
+    """
+
+    def __init__(self, grid):
+        self.sync = grid
+
+    async def put(self, datos, **kwargs):
+        return await en_hilo(self.sync.put, datos, **kwargs)
+
+    async def get(self, archivo_id):
+        return await en_hilo(self.sync.get, archivo_id)
+
+    async def delete(self, archivo_id):
+        return await en_hilo(self.sync.delete, archivo_id)
+
+    async def exists(self, archivo_id):
+        return await en_hilo(self.sync.exists, archivo_id)
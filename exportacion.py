@@ -0,0 +1,82 @@
+"""Exportación en streaming (NDJSON o CSV) de órdenes y reseñas.
+
+Los generadores reciben los lotes de ``ColeccionAsync.iterar_lotes`` y emiten
+un bloque de bytes por lote, de modo que la memoria usada depende del tamaño
+del lote y no del total exportado.
+"""
+
+import csv
+import io
+import json
+
+from serializacion import a_json
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return str(valor)
+
+
+# Columnas CSV: (encabezado, función que extrae el valor del documento)
+COLUMNAS_ORDENES = [
+    ("id", lambda o: o["_id"]),
+    ("usuario_id", lambda o: o.get("usuario_id")),
+    ("restaurante_id", lambda o: o.get("restaurante_id")),
+    ("restaurante_nombre", lambda o: o.get("restaurante_nombre")),
+    ("fecha", lambda o: o.get("fecha")),
+    ("estado", lambda o: o.get("estado")),
+    ("total", lambda o: o.get("total")),
+    ("articulos", lambda o: sum(i.get("cantidad", 0) for i in o.get("pedido", []))),
+    ("pedido", lambda o: json.dumps(
+        [
+            {"articuloId": str(i.get("articuloId")), "nombre": i.get("nombre"),
+             "cantidad": i.get("cantidad"), "precio": i.get("precio")}
+            for i in o.get("pedido", [])
+        ],
+        ensure_ascii=False,
+    )),
+]
+
+COLUMNAS_RESENAS = [
+    ("id", lambda r: r["_id"]),
+    ("usuario_id", lambda r: r.get("usuario_id")),
+    ("restaurante_id", lambda r: r.get("restaurante_id")),
+    ("puntaje", lambda r: r.get("puntaje")),
+    ("comentario", lambda r: r.get("comentario")),
+    ("fecha", lambda r: r.get("fecha")),
+]
+
+
+async def ndjson(lotes):
+    async for lote in lotes:
+        yield b"".join(a_json(doc) + b"\n" for doc in lote)
+
+
+async def csv_filas(lotes, columnas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([nombre for nombre, _ in columnas])
+    async for lote in lotes:
+        for doc in lote:
+            escritor.writerow([_texto(extraer(doc)) for _, extraer in columnas])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Solo el encabezado si no hubo resultados
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def exportar(lotes, formato, columnas):
+    """Devuelve ``(generador_de_bytes, media_type)`` para ``formato``."""
+    if formato == "csv":
+        return csv_filas(lotes, columnas), FORMATOS["csv"]
+    return ndjson(lotes), FORMATOS["ndjson"]
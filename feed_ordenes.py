@@ -0,0 +1,240 @@
+"""Feed en tiempo real de órdenes por restaurante (server-sent events).
+
+Un solo change stream sobre ``ordenes`` por proceso alimenta a todos los
+suscriptores: un hilo lee el stream y publica cada cambio en el event loop,
+que lo reparte a las colas de los clientes suscritos a ese restaurante. Así el
+costo en Mongo no crece con la cantidad de paneles abiertos.
+
+Cada evento SSE lleva como ``id`` el resume token del cambio. Al reconectar,
+el navegador manda ``Last-Event-ID`` y se reenvían los eventos posteriores
+desde un buffer de los últimos ``FEED_BUFFER`` cambios; si el token ya no está
+en el buffer se envía ``event: reinicio`` para que el cliente recargue
+``GET /ordenes`` y siga recibiendo en vivo. El propio hilo usa el último token
+para retomar el stream tras un corte de conexión sin perder cambios; si Mongo
+ya no tiene ese punto del historial, el stream sigue desde ahora y todos los
+suscriptores reciben ``event: reinicio``.
+
+Las órdenes borradas se envían a todos los suscriptores (solo con ``_id``):
+sin pre-imágenes el change stream no dice de qué restaurante eran.
+
+Los change streams requieren replica set. Para probar en local:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 &
+    mongosh --eval 'rs.initiate()'
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" uvicorn main:app
+    curl -N http://localhost:8000/restaurantes/<id>/ordenes/eventos
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from serializacion import a_json
+
+logger = logging.getLogger(__name__)
+
+FEED_BUFFER = int(os.environ.get("FEED_BUFFER", "1000"))
+COLA_SUSCRIPTOR = int(os.environ.get("FEED_COLA", "256"))
+LATIDO_S = 15.0
+
+OPERACIONES = ["insert", "update", "replace", "delete"]
+
+# Códigos de error que indican que el servidor no soporta change streams
+# (standalone, o almacenamiento sin oplog): no tiene sentido reintentar.
+_SIN_CHANGE_STREAMS = {40573, 40324}
+# ChangeStreamFatalError, ChangeStreamHistoryLost e InvalidResumeToken: el
+# token guardado ya no sirve (p. ej. salió del oplog). Se retoma desde ahora.
+_TOKEN_PERDIDO = {280, 286, 260}
+
+
+class Suscripcion:
+    def __init__(self, restaurante_id):
+        self.restaurante_id = restaurante_id
+        self.cola = asyncio.Queue(maxsize=COLA_SUSCRIPTOR)
+        # Se marca si el cliente no consume a tiempo y su cola se llena
+        self.desbordada = False
+
+
+class DifusorOrdenes:
+    def __init__(self):
+        self.disponible = False
+        self._suscripciones = {}  # restaurante_id (str) -> set(Suscripcion)
+        self._buffer = deque(maxlen=FEED_BUFFER)  # (token, restaurante_id, evento)
+        self._token = None
+        self._loop = None
+        self._hilo = None
+        self._parar = threading.Event()
+
+    # -- ciclo de vida -----------------------------------------------------
+
+    def iniciar(self, coleccion):
+        """Arranca el hilo del change stream; llamar desde el event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._parar.clear()
+        self.disponible = True
+        self._hilo = threading.Thread(
+            target=self._vigilar, args=(coleccion,), name="feed-ordenes", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    def _vigilar(self, coleccion):
+        pipeline = [{"$match": {"operationType": {"$in": OPERACIONES}}}]
+        espera = 1
+        while not self._parar.is_set():
+            try:
+                with coleccion.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self._token,
+                    max_await_time_ms=1000,
+                ) as stream:
+                    espera = 1
+                    while not self._parar.is_set():
+                        cambio = stream.try_next()
+                        if cambio is None:
+                            continue
+                        self._token = stream.resume_token
+                        self._loop.call_soon_threadsafe(self._publicar, self._token, cambio)
+            except OperationFailure as e:
+                if e.code in _SIN_CHANGE_STREAMS:
+                    logger.warning("Feed de órdenes deshabilitado (se requiere replica set): %s", e)
+                    self.disponible = False
+                    return
+                if e.code in _TOKEN_PERDIDO and self._token is not None:
+                    logger.warning("Historial del change stream perdido, se retoma desde ahora: %s", e)
+                    self._token = None
+                    self._loop.call_soon_threadsafe(self._reiniciar)
+                    espera = 1
+                    continue
+                logger.warning("Change stream de órdenes interrumpido, reintentando: %s", e)
+            except PyMongoError as e:
+                logger.warning("Change stream de órdenes interrumpido, reintentando: %s", e)
+            except Exception:
+                logger.exception("Error inesperado en el feed de órdenes; se deshabilita")
+                self.disponible = False
+                return
+            self._parar.wait(espera)
+            espera = min(espera * 2, 30)
+
+    # -- reparto -----------------------------------------------------------
+
+    def _publicar(self, token, cambio):
+        """Corre en el event loop: guarda el cambio en el buffer y lo reparte."""
+        evento = evento_de_cambio(cambio)
+        restaurante_id = evento["orden"].get("restaurante_id")
+        restaurante_id = str(restaurante_id) if restaurante_id is not None else None
+        token = token["_data"]
+        self._buffer.append((token, restaurante_id, evento))
+
+        if restaurante_id is None:
+            destinos = [s for grupo in self._suscripciones.values() for s in grupo]
+        else:
+            destinos = list(self._suscripciones.get(restaurante_id, ()))
+        for suscripcion in destinos:
+            try:
+                suscripcion.cola.put_nowait((token, evento))
+            except asyncio.QueueFull:
+                suscripcion.desbordada = True
+                self._quitar(suscripcion)
+
+    def _reiniciar(self):
+        """Corre en el event loop: hubo cambios que no se van a poder enviar.
+
+        Se vacía el buffer (los ids anteriores ya no garantizan continuidad) y
+        se avisa a todos los suscriptores para que recarguen ``GET /ordenes``.
+        """
+        self._buffer.clear()
+        for suscripcion in [s for grupo in self._suscripciones.values() for s in grupo]:
+            try:
+                suscripcion.cola.put_nowait((None, None))
+            except asyncio.QueueFull:
+                suscripcion.desbordada = True
+                self._quitar(suscripcion)
+
+    def suscribir(self, restaurante_id, ultimo_id=None):
+        """Registra un suscriptor y devuelve ``(suscripcion, pendientes, encontrado)``.
+
+        ``pendientes`` son los eventos del buffer posteriores a ``ultimo_id``.
+        El registro y la lectura del buffer ocurren sin ceder el loop, así que
+        no hay huecos ni duplicados entre lo reenviado y lo que llega a la cola.
+        """
+        suscripcion = Suscripcion(restaurante_id)
+        self._suscripciones.setdefault(restaurante_id, set()).add(suscripcion)
+        if not ultimo_id:
+            return suscripcion, [], True
+
+        pendientes, encontrado = [], False
+        for token, rid, evento in self._buffer:
+            if encontrado and rid in (restaurante_id, None):
+                pendientes.append((token, evento))
+            elif token == ultimo_id:
+                encontrado = True
+        return suscripcion, pendientes, encontrado
+
+    def _quitar(self, suscripcion):
+        grupo = self._suscripciones.get(suscripcion.restaurante_id)
+        if grupo is not None:
+            grupo.discard(suscripcion)
+            if not grupo:
+                del self._suscripciones[suscripcion.restaurante_id]
+
+    def desuscribir(self, suscripcion):
+        self._quitar(suscripcion)
+
+    def total_suscriptores(self):
+        return sum(len(grupo) for grupo in self._suscripciones.values())
+
+
+def evento_de_cambio(cambio):
+    tipo = cambio["operationType"]
+    if tipo == "delete":
+        return {"tipo": tipo, "orden": {"_id": cambio["documentKey"]["_id"]}}
+    evento = {"tipo": tipo, "orden": cambio.get("fullDocument") or {"_id": cambio["documentKey"]["_id"]}}
+    if tipo == "update":
+        evento["cambios"] = cambio["updateDescription"].get("updatedFields", {})
+    return evento
+
+
+def _sse(token, evento, nombre="orden"):
+    return f"id: {token}\nevent: {nombre}\ndata: ".encode() + a_json(evento) + b"\n\n"
+
+
+async def eventos_sse(difusor, restaurante_id, ultimo_id=None):
+    """Generador de bytes SSE para un suscriptor; se desuscribe al terminar."""
+    suscripcion, pendientes, encontrado = difusor.suscribir(restaurante_id, ultimo_id)
+    try:
+        yield b"retry: 3000\n\n"
+        if not encontrado:
+            yield b'event: reinicio\ndata: {"motivo":"token_desconocido"}\n\n'
+        for token, evento in pendientes:
+            yield _sse(token, evento)
+        while True:
+            try:
+                token, evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=LATIDO_S)
+            except asyncio.TimeoutError:
+                if suscripcion.desbordada:
+                    break
+                yield b": ping\n\n"
+                continue
+            if evento is None:
+                yield b'event: reinicio\ndata: {"motivo":"historial_perdido"}\n\n'
+            else:
+                yield _sse(token, evento)
+            if suscripcion.desbordada and suscripcion.cola.empty():
+                break
+        # El cliente no siguió el ritmo: que reconecte con su Last-Event-ID
+        yield b'event: reinicio\ndata: {"motivo":"cliente_lento"}\n\n'
+    finally:
+        difusor.desuscribir(suscripcion)
+
+
+feed_ordenes = DifusorOrdenes()
@@ -1,17 +1,26 @@
 import argparse
 import os
 import random
+import struct
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import accumulate
 
 from bson import ObjectId
 from faker import Faker
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 from tqdm import tqdm
 
+from busqueda import campos_busqueda
+from calificaciones import reconstruir_calificaciones
+from ventas import reconstruir_ventas
+
 faker = Faker("es_MX")
 
 # ---------------------------------- Config ----------------------------------
-MONGO_URI = "mongodb+srv://geraxpineda:a@restaurante.j0pm3k9.mongodb.net/?retryWrites=true&w=majority"
+MONGO_URI = "mongodb://localhost:27017"
 
 TOTAL_DOCS = 1000
 
@@ -45,6 +54,87 @@ TIPOS_ARTICULO = [
     "Postre",
 ]
 
+# ------------------------------ Perfiles de carga ----------------------------
+# zipf_*: exponente de popularidad (0 = uniforme). Con s≈1 unos pocos
+# restaurantes/usuarios/artículos concentran la mayoría de las órdenes.
+# horas: peso relativo de cada hora del día (0–23) para la fecha de las órdenes.
+# estados: peso relativo de cada estado de orden.
+
+_HORAS_PLANAS = [1] * 24
+_HORAS_COMIDAS = [
+    0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.8, 1.2, 1.0, 0.9, 1.8,
+    4.0, 4.5, 3.0, 1.2, 0.9, 1.1, 2.0, 3.5, 3.8, 2.5, 1.2, 0.5,
+]
+
+PERFILES = {
+    # Comportamiento original: todo uniforme
+    "uniforme": {
+        "zipf_restaurantes": 0,
+        "zipf_usuarios": 0,
+        "zipf_articulos": 0,
+        "horas": _HORAS_PLANAS,
+        "estados": {e: 1 for e in ESTADOS_ORDEN},
+    },
+    # Histórico típico: pocos restaurantes y platillos muy populares, picos
+    # de almuerzo y cena, casi todo entregado
+    "realista": {
+        "zipf_restaurantes": 1.1,
+        "zipf_usuarios": 0.8,
+        "zipf_articulos": 1.0,
+        "horas": _HORAS_COMIDAS,
+        "estados": {"Pendiente": 3, "En preparación": 4, "Entregado": 88, "Cancelado": 5},
+    },
+    # Hora pico en vivo: sesgo fuerte y muchas órdenes aún abiertas
+    "hora_pico": {
+        "zipf_restaurantes": 1.4,
+        "zipf_usuarios": 1.0,
+        "zipf_articulos": 1.2,
+        "horas": [0] * 12 + [5, 6, 3] + [0] * 9,
+        "estados": {"Pendiente": 40, "En preparación": 35, "Entregado": 20, "Cancelado": 5},
+    },
+}
+
+# Primeros 4 bytes de los ObjectId generados; ver nuevo_id
+_ID_TIMESTAMP = struct.pack(">I", int(datetime.utcnow().timestamp()))
+
+
+def nuevo_id():
+    """ObjectId derivado de ``random``: con la misma semilla se repiten los ids."""
+    return ObjectId(_ID_TIMESTAMP + random.getrandbits(64).to_bytes(8, "big"))
+
+
+_ACUMULADOS = {}
+
+
+def elegir_zipf(elementos, s):
+    """Elige un elemento con probabilidad proporcional a 1 / rango^s."""
+    if not s:
+        return random.choice(elementos)
+    clave = (len(elementos), s)
+    acumulado = _ACUMULADOS.get(clave)
+    if acumulado is None:
+        acumulado = _ACUMULADOS[clave] = list(accumulate(1 / (i + 1) ** s for i in range(len(elementos))))
+    return random.choices(elementos, cum_weights=acumulado)[0]
+
+
+def muestra_zipf(elementos, k, s):
+    """Como random.sample pero sesgado por elegir_zipf (sin repetidos)."""
+    if not s:
+        return random.sample(elementos, k=k)
+    elegidos = {}
+    while len(elegidos) < k:
+        elemento = elegir_zipf(elementos, s)
+        elegidos[id(elemento)] = elemento
+    return list(elegidos.values())
+
+
+def fecha_orden(perfil, fin):
+    """Día uniforme en el último año y hora según el perfil."""
+    dia = fin - timedelta(days=random.randint(1, 365))
+    hora = random.choices(range(24), weights=perfil["horas"])[0]
+    return dia.replace(hour=hora, minute=random.randint(0, 59), second=random.randint(0, 59))
+
+
 def random_coords():
     lat = 14.55 + random.random() * 0.15
     lon = -90.65 + random.random() * 0.3
@@ -56,7 +146,7 @@ def gen_restaurantes(n):
         nombre = f"{faker.company()} {random.choice(['Restaurant', 'Bistro', 'Diner', 'Café'])}"
         tipo_list = random.sample(TIPOS_COMIDA, k=random.randint(1, 2))
         yield {
-            "_id": ObjectId(),
+            "_id": nuevo_id(),
             "nombre": nombre,
             "direccion": {
                 "calle": faker.street_name(),
@@ -65,12 +155,13 @@ def gen_restaurantes(n):
             },
             "tipo_comida": tipo_list,
             "horario": {"abre": "10:00", "cierra": "22:00"},
+            **campos_busqueda(nombre),
         }
 
 
 def gen_usuarios(n, restaurante_ids):
     for _ in range(n):
-        uid = ObjectId()
+        uid = nuevo_id()
         favoritos = random.sample(restaurante_ids, k=random.randint(1, 3))
         yield {
             "_id": uid,
@@ -84,24 +175,31 @@ def gen_articulos(n, restaurante_ids):
     for _ in range(n):
         rid = random.choice(restaurante_ids)
         nombre = faker.catch_phrase()
+        descripcion = faker.sentence()
         tipo = random.sample(TIPOS_ARTICULO, k=random.randint(1, 2))
         yield {
-            "_id": ObjectId(),
+            "_id": nuevo_id(),
             "restaurante_id": rid,
             "nombre": nombre,
-            "descripcion": faker.sentence(),
+            "descripcion": descripcion,
             "precio": random.randint(30, 150),
             "tipo": tipo,
+            **campos_busqueda(nombre, descripcion),
         }
 
 
-def gen_ordenes(n, restaurante_ids, usuario_ids, articulos_by_rest):
+def gen_ordenes(
+    n, restaurante_ids, usuario_ids, articulos_by_rest, perfil=PERFILES["uniforme"], fin=None,
+    restaurante_nombres=None,
+):
+    fin = fin or datetime.utcnow()
+    estados, pesos_estados = zip(*perfil["estados"].items())
     for _ in range(n):
-        rid = random.choice(restaurante_ids)
-        uid = random.choice(usuario_ids)
+        rid = elegir_zipf(restaurante_ids, perfil["zipf_restaurantes"])
+        uid = elegir_zipf(usuario_ids, perfil["zipf_usuarios"])
         articulos_rest = articulos_by_rest[rid]
         num_items = random.randint(1, 4)
-        items = random.sample(articulos_rest, k=min(num_items, len(articulos_rest)))
+        items = muestra_zipf(articulos_rest, min(num_items, len(articulos_rest)), perfil["zipf_articulos"])
         pedido = []
         total = 0
         for art in items:
@@ -116,84 +214,236 @@ def gen_ordenes(n, restaurante_ids, usuario_ids, articulos_by_rest):
                     "precio": art["precio"],
                 }
             )
-        fecha = faker.date_time_between(start_date="-1y", end_date="now")
         yield {
-            "_id": ObjectId(),
+            "_id": nuevo_id(),
             "usuario_id": uid,
             "restaurante_id": rid,
-            "fecha": fecha,
-            "estado": random.choice(ESTADOS_ORDEN),
+            "restaurante_nombre": (restaurante_nombres or {}).get(rid, "Desconocido"),
+            "fecha": fecha_orden(perfil, fin),
+            "estado": random.choices(estados, weights=pesos_estados)[0],
             "pedido": pedido,
             "total": total,
         }
 
 
-def gen_resenas(n, restaurante_ids, usuario_ids):
+def gen_resenas(n, restaurante_ids, usuario_ids, perfil=PERFILES["uniforme"], fin=None):
+    fin = fin or datetime.utcnow()
     for _ in range(n):
         yield {
-            "_id": ObjectId(),
-            "usuario_id": random.choice(usuario_ids),
-            "restaurante_id": random.choice(restaurante_ids),
+            "_id": nuevo_id(),
+            "usuario_id": elegir_zipf(usuario_ids, perfil["zipf_usuarios"]),
+            "restaurante_id": elegir_zipf(restaurante_ids, perfil["zipf_restaurantes"]),
             "puntaje": random.randint(1, 5),
             "comentario": faker.sentence(nb_words=12),
-            "fecha": faker.date_time_between(start_date="-1y", end_date="now"),
+            "fecha": faker.date_time_between(start_date=fin - timedelta(days=365), end_date=fin),
         }
 
 
+# ------------------------------ Carga en lotes ------------------------------
+# Cada lote se genera en un proceso del pool con su propia semilla y se inserta
+# desde el proceso principal con insert_many(ordered=False). Solo se mantienen
+# en memoria los ids (y precio/nombre de los artículos) que otras colecciones
+# necesitan referenciar, nunca las órdenes o reseñas ya insertadas.
+
+TAMANO_LOTE = 5000
+
+# Datos de referencia de cada proceso del pool (ids de restaurantes, etc.)
+_REFS = {}
+
+
+def _iniciar_trabajador(refs):
+    global _REFS, _ID_TIMESTAMP
+    _REFS = refs
+    if "fin" in refs:
+        _ID_TIMESTAMP = struct.pack(">I", int(refs["fin"].timestamp()))
+
+
+def _generar_lote(tipo, n, semilla):
+    random.seed(semilla)
+    faker.seed_instance(semilla)
+    faker.unique.clear()
+    if tipo == "restaurantes":
+        return list(gen_restaurantes(n))
+    if tipo == "usuarios":
+        return list(gen_usuarios(n, _REFS["restaurante_ids"]))
+    if tipo == "articulos":
+        return list(gen_articulos(n, _REFS["restaurante_ids"]))
+    if tipo == "ordenes":
+        return list(
+            gen_ordenes(
+                n, _REFS["restaurantes_con_art"], _REFS["usuario_ids"], _REFS["articulos_by_rest"],
+                perfil=PERFILES[_REFS["perfil"]], fin=_REFS["fin"],
+                restaurante_nombres=_REFS["restaurante_nombres"],
+            )
+        )
+    if tipo == "resenas":
+        return list(
+            gen_resenas(
+                n, _REFS["restaurante_ids"], _REFS["usuario_ids"],
+                perfil=PERFILES[_REFS["perfil"]], fin=_REFS["fin"],
+            )
+        )
+    raise ValueError(f"Tipo desconocido: {tipo}")
+
+
+def _insertar(coleccion, docs, barra, al_insertar):
+    try:
+        coleccion.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        print(f"  {coleccion.name}: {len(e.details['writeErrors'])} documentos rechazados en un lote")
+    if al_insertar:
+        al_insertar(docs)
+    barra.update(len(docs))
+
+
+def cargar(coleccion, tipo, total, args, semilla, refs=None, al_insertar=None):
+    """Genera ``total`` documentos de ``tipo`` en lotes y los inserta en ``coleccion``.
+
+    Con ``--procesos`` > 1 los lotes se generan en paralelo; como mucho hay
+    ``2 * procesos`` lotes en vuelo, así que la memoria no crece con ``total``.
+    """
+    refs = {**(refs or {}), "perfil": args.perfil, "fin": args.hasta}
+    tareas = (
+        (tipo, min(args.lote, total - inicio), semilla + k)
+        for k, inicio in enumerate(range(0, total, args.lote))
+    )
+    with tqdm(total=total, desc=coleccion.name) as barra:
+        if args.procesos <= 1:
+            _iniciar_trabajador(refs)
+            for tarea in tareas:
+                _insertar(coleccion, _generar_lote(*tarea), barra, al_insertar)
+            return
+
+        en_vuelo = deque()
+        with ProcessPoolExecutor(
+            max_workers=args.procesos, initializer=_iniciar_trabajador, initargs=(refs,)
+        ) as pool:
+            for tarea in tareas:
+                en_vuelo.append(pool.submit(_generar_lote, *tarea))
+                if len(en_vuelo) >= 2 * args.procesos:
+                    _insertar(coleccion, en_vuelo.popleft().result(), barra, al_insertar)
+            while en_vuelo:
+                _insertar(coleccion, en_vuelo.popleft().result(), barra, al_insertar)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Genera datos de prueba para la base Proyecto.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", MONGO_URI))
+    parser.add_argument("--db", default="Proyecto")
+    parser.add_argument("--restaurantes", type=int, default=NUM_RESTAURANTES)
+    parser.add_argument("--usuarios", type=int, default=NUM_USUARIOS)
+    parser.add_argument("--articulos", type=int, default=NUM_ARTICULOS)
+    parser.add_argument("--ordenes", type=int, default=NUM_ORDENES)
+    parser.add_argument("--resenas", type=int, default=NUM_RESEÑAS)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Documentos por insert_many")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="Procesos generadores")
+    parser.add_argument("--limpiar", action="store_true", help="Vaciar las colecciones antes de cargar")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para repetir exactamente una carga")
+    parser.add_argument("--perfil", choices=sorted(PERFILES), default="uniforme", help="Perfil de carga")
+    parser.add_argument(
+        "--hasta",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Fecha final (YYYY-MM-DD) del año de órdenes y reseñas; por defecto hoy",
+    )
+    args = parser.parse_args()
+    if args.hasta is None:
+        args.hasta = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return args
+
+
 def main():
-    client = MongoClient(MONGO_URI)
-    db = client["Proyecto"]
+    args = parse_args()
+    client = MongoClient(args.uri)
+    db = client[args.db]
+    semilla = args.semilla if args.semilla is not None else random.randrange(2**32)
+    print(f"Perfil {args.perfil}, semilla {semilla}")
+    _iniciar_trabajador({"fin": args.hasta})
+
+    if args.limpiar:
+        for col in ["restaurantes", "usuarios", "articulos", "ordenes", "reseñas"]:
+            db[col].drop()
 
     # 1. Restaurantes
-    print("Generando restaurantes…")
-    restaurantes = list(tqdm(gen_restaurantes(NUM_RESTAURANTES), total=NUM_RESTAURANTES))
-    db.restaurantes.insert_many(restaurantes)
-    restaurante_ids = [r["_id"] for r in restaurantes]
+    restaurante_ids = []
+    restaurante_nombres = {}  # las órdenes copian el nombre (ver propagacion.py)
 
-    # 2. Usuarios
-    print("Generando usuarios…")
-    usuarios = list(tqdm(gen_usuarios(NUM_USUARIOS, restaurante_ids), total=NUM_USUARIOS))
-    db.usuarios.insert_many(usuarios)
-    usuario_ids = [u["_id"] for u in usuarios]
+    def guardar_restaurantes(docs):
+        restaurante_ids.extend(r["_id"] for r in docs)
+        restaurante_nombres.update((r["_id"], r["nombre"]) for r in docs)
 
-    # 3. Artículos
-    print("Generando artículos del menú…")
-    articulos = list(tqdm(gen_articulos(NUM_ARTICULOS, restaurante_ids), total=NUM_ARTICULOS))
-    # db.articulos.insert_many(articulos)
+    cargar(
+        db.restaurantes, "restaurantes", args.restaurantes, args, semilla,
+        al_insertar=guardar_restaurantes,
+    )
+
+    # 2. Usuarios
+    usuario_ids = []
+    cargar(
+        db.usuarios, "usuarios", args.usuarios, args, semilla + 1_000_000,
+        refs={"restaurante_ids": restaurante_ids},
+        al_insertar=lambda docs: usuario_ids.extend(u["_id"] for u in docs),
+    )
 
+    # 3. Artículos (solo se conserva lo que las órdenes copian de cada uno)
     articulos_by_rest = {}
-    for art in articulos:
-        articulos_by_rest.setdefault(art["restaurante_id"], []).append(art)
+
+    def agrupar_articulos(docs):
+        for art in docs:
+            articulos_by_rest.setdefault(art["restaurante_id"], []).append(
+                {"_id": art["_id"], "nombre": art["nombre"], "precio": art["precio"]}
+            )
+
+    cargar(
+        db.articulos, "articulos", args.articulos, args, semilla + 2_000_000,
+        refs={"restaurante_ids": restaurante_ids}, al_insertar=agrupar_articulos,
+    )
 
     faltantes = [rid for rid in restaurante_ids if len(articulos_by_rest.get(rid, [])) < MIN_ARTS_PER_REST]
     if faltantes:
         print(f"Añadiendo artículos faltantes a {len(faltantes)} restaurantes…")
+        # Se generan en este proceso: semilla propia para no depender de --procesos
+        random.seed(semilla + 5_000_000)
+        faker.seed_instance(semilla + 5_000_000)
         extra_articulos = []
         for rid in faltantes:
             current = articulos_by_rest.get(rid, [])
             needed = MIN_ARTS_PER_REST - len(current)
-            for _ in range(needed):
-                art = next(gen_articulos(1, [rid]))
-                extra_articulos.append(art)
-                articulos_by_rest.setdefault(rid, []).append(art)
-        db.articulos.insert_many(extra_articulos)
+            extra_articulos.extend(gen_articulos(needed, [rid]))
+            if len(extra_articulos) >= args.lote:
+                db.articulos.insert_many(extra_articulos, ordered=False)
+                agrupar_articulos(extra_articulos)
+                extra_articulos = []
+        if extra_articulos:
+            db.articulos.insert_many(extra_articulos, ordered=False)
+            agrupar_articulos(extra_articulos)
 
     restaurantes_con_art = list(articulos_by_rest.keys())
 
     # 4. Órdenes
-    print("Generando órdenes…")
-    ordenes = list(
-        tqdm(
-            gen_ordenes(NUM_ORDENES, restaurantes_con_art, usuario_ids, articulos_by_rest),
-            total=NUM_ORDENES,
-        )
+    cargar(
+        db.ordenes, "ordenes", args.ordenes, args, semilla + 3_000_000,
+        refs={
+            "restaurantes_con_art": restaurantes_con_art,
+            "usuario_ids": usuario_ids,
+            "articulos_by_rest": articulos_by_rest,
+            "restaurante_nombres": restaurante_nombres,
+        },
     )
-    db.ordenes.insert_many(ordenes)
 
     # 5. Reseñas
-    print("Generando reseñas…")
-    reseñas = list(tqdm(gen_resenas(NUM_RESEÑAS, restaurante_ids, usuario_ids), total=NUM_RESEÑAS))
-    db.reseñas.insert_many(reseñas)
+    cargar(
+        db.reseñas, "resenas", args.resenas, args, semilla + 4_000_000,
+        refs={"restaurante_ids": restaurante_ids, "usuario_ids": usuario_ids},
+    )
+
+    # 6. Estadísticas de calificación derivadas de las reseñas
+    print("Calculando calificaciones…")
+    reconstruir_calificaciones(db)
+
+    # 7. Resumen diario de ventas derivado de las órdenes
+    print("Calculando resumen de ventas…")
+    reconstruir_ventas(db)
 
     print("\nCarga terminada Documentos totales:")
     for col in ["restaurantes", "usuarios", "articulos", "ordenes", "reseñas"]:
@@ -201,5 +451,4 @@ def main():
 
 
 if __name__ == "__main__":
-    
     main()
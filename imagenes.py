@@ -0,0 +1,192 @@
+"""Entrega HTTP de imágenes de GridFS: caché de cliente, rangos y LRU en memoria.
+
+Una imagen nunca cambia bajo el mismo id (reemplazarla crea un archivo nuevo y
+actualiza ``imagen_id`` del artículo), así que las respuestas se marcan como
+``immutable`` con un ``max-age`` de un año y el ``ETag`` se deriva del id.
+
+Las imágenes pequeñas más pedidas se guardan completas en un LRU acotado por
+memoria total (``CACHE_IMAGENES_MB``) y por tamaño por archivo
+(``CACHE_IMAGEN_MAX_MB``); las demás se transmiten desde GridFS por chunks.
+"""
+
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+
+def etag_de(imagen_id):
+    return f'"{imagen_id}"'
+
+
+@dataclass
+class MetaImagen:
+    etag: str
+    ultima_modificacion: datetime
+    longitud: int
+    content_type: str
+
+    @classmethod
+    def desde_grid_out(cls, grid_out):
+        fecha = grid_out.upload_date.replace(tzinfo=timezone.utc, microsecond=0)
+        return cls(
+            etag=etag_de(grid_out._id),
+            ultima_modificacion=fecha,
+            longitud=grid_out.length,
+            content_type=grid_out.content_type or "application/octet-stream",
+        )
+
+    def encabezados(self):
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.ultima_modificacion, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+
+
+class CacheImagenes:
+    """LRU de imágenes completas acotado por bytes totales."""
+
+    def __init__(self, max_bytes, max_bytes_archivo):
+        self.max_bytes = max_bytes
+        self.max_bytes_archivo = max_bytes_archivo
+        self.bytes_usados = 0
+        self._entradas = OrderedDict()
+
+    def cabe(self, longitud):
+        return longitud <= min(self.max_bytes_archivo, self.max_bytes)
+
+    def obtener(self, imagen_id):
+        entrada = self._entradas.get(imagen_id)
+        if entrada is not None:
+            self._entradas.move_to_end(imagen_id)
+        return entrada
+
+    def guardar(self, imagen_id, meta, datos):
+        if not self.cabe(len(datos)) or imagen_id in self._entradas:
+            return
+        self._entradas[imagen_id] = (meta, datos)
+        self.bytes_usados += len(datos)
+        while self.bytes_usados > self.max_bytes:
+            _, (_, viejos) = self._entradas.popitem(last=False)
+            self.bytes_usados -= len(viejos)
+
+    def descartar(self, imagen_id):
+        entrada = self._entradas.pop(imagen_id, None)
+        if entrada is not None:
+            self.bytes_usados -= len(entrada[1])
+
+
+cache_imagenes = CacheImagenes(
+    max_bytes=int(float(os.environ.get("CACHE_IMAGENES_MB", "64")) * 1024 * 1024),
+    max_bytes_archivo=int(float(os.environ.get("CACHE_IMAGEN_MAX_MB", "2")) * 1024 * 1024),
+)
+
+
+def _etiquetas(si_no_coincide):
+    return [e.strip().removeprefix("W/") for e in si_no_coincide.split(",")]
+
+
+def respuesta_sin_cambios(imagen_id, encabezados):
+    """304 sin tocar GridFS si ``If-None-Match`` trae el ETag de ``imagen_id``.
+
+    El contenido de un id nunca cambia, así que el ETag basta para saber que
+    el cliente ya lo tiene. Devuelve ``None`` si hay que buscar la imagen.
+    """
+    si_no_coincide = encabezados.get("if-none-match")
+    etag = etag_de(imagen_id)
+    if si_no_coincide is None or etag not in _etiquetas(si_no_coincide):
+        return None
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def no_modificada(meta, encabezados):
+    """True si el cliente ya tiene esta versión (If-None-Match / If-Modified-Since)."""
+    si_no_coincide = encabezados.get("if-none-match")
+    if si_no_coincide is not None:
+        etiquetas = _etiquetas(si_no_coincide)
+        return "*" in etiquetas or meta.etag in etiquetas
+    si_modificada = encabezados.get("if-modified-since")
+    if si_modificada:
+        try:
+            return meta.ultima_modificacion <= parsedate_to_datetime(si_modificada)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def rango_solicitado(encabezado, longitud):
+    """Interpreta un ``Range`` de un solo tramo.
+
+    Devuelve ``None`` si no hay rango utilizable (se responde el archivo
+    completo), ``(inicio, fin)`` inclusivo, o ``False`` si no es satisfacible.
+    """
+    if not encabezado:
+        return None
+    coincide = _RANGO.match(encabezado.strip())
+    if not coincide:
+        return None  # rangos múltiples o sintaxis desconocida: archivo completo
+    inicio, fin = coincide.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        sufijo = int(fin)
+        if sufijo == 0:
+            return False
+        return max(longitud - sufijo, 0), longitud - 1
+    inicio = int(inicio)
+    fin = min(int(fin), longitud - 1) if fin else longitud - 1
+    if inicio >= longitud or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _leer_tramo(grid_out, inicio, fin):
+    grid_out.seek(inicio)
+    restantes = fin - inicio + 1
+    while restantes > 0:
+        bloque = grid_out.read(min(grid_out.chunk_size, restantes))
+        if not bloque:
+            break
+        restantes -= len(bloque)
+        yield bloque
+
+
+def responder_imagen(meta, encabezados, datos=None, grid_out=None):
+    """Arma la respuesta (200, 206, 304 o 416) desde bytes en caché o un ``GridOut``."""
+    cabeceras = meta.encabezados()
+    if no_modificada(meta, encabezados):
+        return Response(status_code=304, headers=cabeceras)
+
+    rango = rango_solicitado(encabezados.get("range"), meta.longitud)
+    if rango is False:
+        cabeceras["Content-Range"] = f"bytes */{meta.longitud}"
+        return Response(status_code=416, headers=cabeceras)
+
+    inicio, fin = rango or (0, meta.longitud - 1)
+    estado = 206 if rango else 200
+    if rango:
+        cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{meta.longitud}"
+
+    if datos is not None:
+        return Response(
+            content=datos[inicio:fin + 1], status_code=estado,
+            media_type=meta.content_type, headers=cabeceras,
+        )
+    cabeceras["Content-Length"] = str(max(fin - inicio + 1, 0))
+    return StreamingResponse(
+        _leer_tramo(grid_out, inicio, fin), status_code=estado,
+        media_type=meta.content_type, headers=cabeceras,
+    )
@@ -0,0 +1,183 @@
+"""Definición declarativa de los índices de cada colección.
+
+``aplicar_indices`` crea lo que falte y recrea los índices cuya definición
+cambió, así que puede ejecutarse en cada arranque sin efectos secundarios.
+También se puede usar desde la terminal:
+
+    python indices.py --uri mongodb://localhost:27017            # aplicar
+    python indices.py --uri mongodb://localhost:27017 --reporte  # índices sin uso
+"""
+
+import argparse
+import logging
+import os
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel, MongoClient
+
+logger = logging.getLogger(__name__)
+
+# Los índices que sirven un ordenamiento terminan en _id: es el desempate de la
+# paginación por cursor (ver paginacion.py).
+INDICES = {
+    "ordenes": [
+        # listar_ordenes_usuario y listar_ordenes?usuario_id=..., ordenadas por fecha
+        IndexModel(
+            [("usuario_id", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)],
+            name="usuario_fecha",
+        ),
+        # cambiar_estado_masivo (restaurante + estado) y listar_ordenes con ambos filtros
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("estado", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)],
+            name="restaurante_estado_fecha",
+        ),
+        # listar_ordenes?restaurante_id=... sin estado
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)],
+            name="restaurante_fecha",
+        ),
+        IndexModel([("estado", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)], name="estado_fecha"),
+        IndexModel([("fecha", DESCENDING), ("_id", DESCENDING)], name="fecha"),
+        # propagacion.py: órdenes con un artículo renombrado
+        IndexModel([("pedido.articuloId", ASCENDING)], name="pedido_articulo"),
+    ],
+    "reseñas": [
+        # listar_resenas por restaurante con sort=fecha o sort=puntaje
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)],
+            name="restaurante_fecha",
+        ),
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("puntaje", DESCENDING), ("_id", DESCENDING)],
+            name="restaurante_puntaje",
+        ),
+        IndexModel(
+            [("usuario_id", ASCENDING), ("fecha", DESCENDING), ("_id", DESCENDING)],
+            name="usuario_fecha",
+        ),
+        IndexModel([("fecha", DESCENDING), ("_id", DESCENDING)], name="fecha"),
+    ],
+    "articulos": [
+        # listar_menu (restaurante + tipo opcional) y el detalle del restaurante
+        IndexModel([("restaurante_id", ASCENDING), ("tipo", ASCENDING)], name="restaurante_tipo"),
+        # eliminar_imagen busca el artículo dueño de una imagen
+        IndexModel([("imagen_id", ASCENDING)], name="imagen", sparse=True),
+        # /buscar/articulos (ver busqueda.py), en todo el catálogo o en un restaurante
+        IndexModel([("nombre_normalizado", ASCENDING)], name="nombre_normalizado"),
+        IndexModel([("busqueda", ASCENDING)], name="busqueda"),
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("nombre_normalizado", ASCENDING)],
+            name="restaurante_nombre_normalizado",
+        ),
+        IndexModel([("restaurante_id", ASCENDING), ("busqueda", ASCENDING)], name="restaurante_busqueda"),
+    ],
+    "calificaciones": [
+        # /restaurantes/mejor_calificados (ver calificaciones.py)
+        IndexModel([("promedio", DESCENDING)], name="promedio"),
+    ],
+    "ventas_diarias": [
+        # Clave del resumen (upserts de ventas.py) y /restaurantes/{id}/ventas por rango
+        IndexModel(
+            [("restaurante_id", ASCENDING), ("dia", ASCENDING), ("estado", ASCENDING)],
+            name="restaurante_dia_estado",
+            unique=True,
+        ),
+        # /ventas/ranking: rango de días de todos los restaurantes
+        IndexModel([("dia", ASCENDING), ("restaurante_id", ASCENDING)], name="dia_restaurante"),
+    ],
+    "restaurantes": [
+        IndexModel([("nombre", ASCENDING), ("_id", ASCENDING)], name="nombre"),
+        IndexModel(
+            [("tipo_comida", ASCENDING), ("nombre", ASCENDING), ("_id", ASCENDING)],
+            name="tipo_comida_nombre",
+        ),
+        # /buscar/restaurantes y listar_restaurantes?search=... (ver busqueda.py)
+        IndexModel([("nombre_normalizado", ASCENDING)], name="nombre_normalizado"),
+        IndexModel([("busqueda", ASCENDING)], name="busqueda"),
+        # /restaurantes/cercanos ($geoNear); coordenadas es un par [long, lat]
+        IndexModel([("direccion.coordenadas", GEOSPHERE)], name="coordenadas"),
+    ],
+}
+
+# Opciones que distinguen dos índices con la misma clave
+_OPCIONES = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _firma(clave, opciones):
+    """Clave y opciones relevantes de un índice, en forma comparable."""
+    return list(clave), {k: opciones[k] for k in _OPCIONES if k in opciones}
+
+
+def aplicar_indices(db, indices=INDICES):
+    """Crea o actualiza los índices declarados; devuelve ``{coleccion: [acciones]}``."""
+    cambios = {}
+    for nombre_col, modelos in indices.items():
+        coleccion = db[nombre_col]
+        existentes = coleccion.index_information()
+        por_clave = {tuple(info["key"]): nombre for nombre, info in existentes.items()}
+        acciones = []
+        pendientes = []
+        for modelo in modelos:
+            doc = modelo.document
+            actual = existentes.get(doc["name"])
+            if actual is None and tuple(doc["key"].items()) in por_clave:
+                # Mismo índice creado a mano con otro nombre: no se duplica
+                acciones.append(f"{doc['name']} ya existe como {por_clave[tuple(doc['key'].items())]}")
+            elif actual is None:
+                pendientes.append(modelo)
+                acciones.append(f"crear {doc['name']}")
+            elif _firma(actual["key"], actual) != _firma(doc["key"].items(), doc):
+                coleccion.drop_index(doc["name"])
+                pendientes.append(modelo)
+                acciones.append(f"recrear {doc['name']}")
+        if pendientes:
+            coleccion.create_indexes(pendientes)
+        if acciones:
+            logger.info("Índices de %s: %s", nombre_col, ", ".join(acciones))
+        cambios[nombre_col] = acciones
+    return cambios
+
+
+def reporte_indices_sin_uso(db, indices=INDICES):
+    """Índices existentes sin accesos desde el último reinicio de mongod.
+
+    Usa ``$indexStats``; cada entrada indica además si el índice está en la
+    definición declarativa o sobra.
+    """
+    sin_uso = []
+    for nombre_col in db.list_collection_names():
+        declarados = {m.document["name"] for m in indices.get(nombre_col, [])}
+        for stats in db[nombre_col].aggregate([{"$indexStats": {}}]):
+            if stats["name"] == "_id_" or stats["accesses"]["ops"] > 0:
+                continue
+            sin_uso.append(
+                {
+                    "coleccion": nombre_col,
+                    "indice": stats["name"],
+                    "desde": stats["accesses"]["since"],
+                    "declarado": stats["name"] in declarados,
+                }
+            )
+    return sin_uso
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica o revisa los índices de la base.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="Proyecto")
+    parser.add_argument("--reporte", action="store_true", help="Solo listar índices sin uso")
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri)[args.db]
+    if args.reporte:
+        for item in reporte_indices_sin_uso(db):
+            marca = "" if item["declarado"] else "  (no declarado)"
+            print(f"  {item['coleccion']:12s} {item['indice']:30s} sin uso desde {item['desde']}{marca}")
+        return
+
+    for nombre_col, acciones in aplicar_indices(db).items():
+        print(f"  {nombre_col:12s}: {', '.join(acciones) if acciones else 'sin cambios'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
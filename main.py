@@ -1,11 +1,11 @@
-import os
-from datetime import datetime
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from typing import List, Optional
 import gridfs
-from fastapi.responses import FileResponse
 from fastapi.responses import JSONResponse
 import json
-from fastapi.encoders import jsonable_encoder
 
 
 from fastapi import (
@@ -17,16 +17,77 @@ from fastapi import (
     File,
     Query,
     status,
-    Form
+    Form,
+    Request,
+    Response,
 )
 from pydantic import BaseModel
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, GEOSPHERE
-from pymongo.errors import DuplicateKeyError
+from pymongo import ASCENDING, DESCENDING
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson import ObjectId
 
-app = FastAPI()
+from datos import BaseDatosAsync, GridFSAsync, en_hilo
+from conexion import LECTURAS, MONGO_DB, bases_por_perfil, calentar, crear_cliente
+from calificaciones import ajustar_calificacion, calificacion_vacia, completar_histograma, puntaje_valido
+from paginacion import ENCABEZADO_CURSOR, filtro_con_cursor, orden_keyset, poner_siguiente_cursor
+from serializacion import RespuestaJSON
+from exportacion import COLUMNAS_ORDENES, COLUMNAS_RESENAS, exportar
+from imagenes import MetaImagen, cache_imagenes, responder_imagen, respuesta_sin_cambios
+from subida_lote import LoteImagenes
+from cache_respuestas import (
+    cache_respuestas,
+    id_canonico,
+    invalidar_articulo,
+    invalidar_menu,
+    invalidar_restaurante,
+    leer_con_cache,
+)
+from metricas import EscuchaMongo, MiddlewareMetricas, metricas
+from feed_ordenes import eventos_sse, feed_ordenes
+from ventas import ajustar_ventas, borrar_ordenes, cambiar_estado, periodo_de
+from busqueda import SIN_CAMPOS_BUSQUEDA, buscar, campos_busqueda, filtro_palabras
+from propagacion import SIN_NOMBRE, nombre_de, propagador
+
+logger = logging.getLogger(__name__)
+
+
+# Se crean en el lifespan, una vez por worker (ver conexion.py)
+client = None
+mongo_db = None
+db = None
+fs = None
+lecturas = {}
+
+
+def lectura(endpoint):
+    """Base con la preferencia de lectura configurada para ``endpoint`` (ver conexion.py)."""
+    return lecturas.get(LECTURAS.get(endpoint, "primario"), db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, mongo_db, db, fs, lecturas
+    client = crear_cliente(event_listeners=[EscuchaMongo()])
+    mongo_db = client[MONGO_DB]
+    # Todos los endpoints pasan por estas envolturas async (ver datos.py)
+    db = BaseDatosAsync(mongo_db)
+    fs = GridFSAsync(gridfs.GridFS(mongo_db))
+    lecturas = bases_por_perfil(db)
+
+    # Conexiones abiertas e índices listos antes de aceptar peticiones
+    await en_hilo(calentar, client, mongo_db)
+    feed_ordenes.iniciar(mongo_db.ordenes)
+    propagador.iniciar(db)
+    yield
+    await propagador.detener()
+    await en_hilo(feed_ordenes.detener)
+    client.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=RespuestaJSON)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,27 +95,122 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ENCABEZADO_CURSOR],
 )
+# Se agrega al final para que sea el más externo y mida también a CORS
+app.add_middleware(MiddlewareMetricas)
+
+@app.get("/")
+def root():
+    return {"message": "Connected..."}
+
+
+@app.get("/salud", tags=["Sistema"])
+async def salud():
+    """Chequeo de disponibilidad para balanceadores: responde 503 si Mongo no contesta."""
+    try:
+        await en_hilo(mongo_db.command, "ping")
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Mongo no disponible: {e}")
+    return {"estado": "ok"}
+
+
+@app.get("/cache", tags=["Sistema"])
+def estadisticas_cache():
+    """Aciertos, fallos y ocupación del caché de respuestas de este proceso."""
+    return cache_respuestas.estadisticas()
+
+
+@app.get("/metrics", tags=["Sistema"], include_in_schema=False)
+def exponer_metricas():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    cache = cache_respuestas.estadisticas()
+    extras = [
+        ("cache_respuestas_aciertos_total", "counter", "Aciertos del caché de respuestas.", cache["aciertos"]),
+        ("cache_respuestas_fallos_total", "counter", "Fallos del caché de respuestas.", cache["fallos"]),
+        ("cache_respuestas_bytes", "gauge", "Bytes usados por el caché de respuestas.", cache["bytes"]),
+        ("cache_imagenes_bytes", "gauge", "Bytes usados por el caché de imágenes.", cache_imagenes.bytes_usados),
+        ("feed_ordenes_suscriptores", "gauge", "Clientes conectados al feed de órdenes.",
+         feed_ordenes.total_suscriptores()),
+        ("propagacion_pendientes", "gauge", "Renombres esperando ser copiados a las órdenes.",
+         propagador.total_pendientes()),
+    ]
+    return Response(
+        content=metricas.exponer(extras), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+# ---------------------------------------------------------------------------
+# LECTURA POR LOTES – un solo $in por colección para las tarjetas del front
+# ---------------------------------------------------------------------------
+# Se declaran antes que /restaurantes/{id}, /articulos/{id} y /ordenes/{id}
+# para que "lote" no se tome como un id.
+
+MAX_IDS_LOTE = 500
+
+
+def ids_de_lote(ids):
+    """Ids de ``?ids=a,b&ids=c`` sin repetir y en el orden pedido."""
+    pedidos = list(dict.fromkeys(
+        i.strip() for valor in ids for i in valor.split(",") if i.strip()
+    ))
+    if not pedidos:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un id")
+    if len(pedidos) > MAX_IDS_LOTE:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_IDS_LOTE} ids por consulta")
+    return pedidos
+
+
+def proyeccion_de_campos(campos, defecto=None):
+    """``campos=nombre,precio`` -> ``{"nombre": 1, "precio": 1}`` (``_id`` siempre va)."""
+    if not campos:
+        return defecto
+    nombres = [c.strip() for c in campos.split(",") if c.strip()]
+    if not nombres or any(c.startswith("$") or ".." in c for c in nombres):
+        raise HTTPException(status_code=400, detail="Lista de campos inválida")
+    return {c: 1 for c in nombres}
+
+
+async def obtener_lote(coleccion, ids, campos, defecto=None):
+    """``{"resultados": {id: doc | null}, "no_encontrados": [...]}`` para los ids pedidos.
+
+    Los ids mal formados cuentan como no encontrados en lugar de hacer fallar
+    a todo el lote.
+    """
+    pedidos = ids_de_lote(ids)
+    validos = {i: ObjectId(i) for i in pedidos if ObjectId.is_valid(i)}
+    encontrados = await coleccion.find_por_ids(
+        list(validos.values()), projection=proyeccion_de_campos(campos, defecto)
+    )
+    resultados = {i: encontrados.get(validos.get(i)) for i in pedidos}
+    return RespuestaJSON({
+        "resultados": resultados,
+        "no_encontrados": [i for i, doc in resultados.items() if doc is None],
+    })
 
-MONGO_URI = "mongodb+srv://geraxpineda:a@restaurante.j0pm3k9.mongodb.net/?retryWrites=true&w=majority"
-client = MongoClient(MONGO_URI)
-db = client["Proyecto"]
 
-fs = gridfs.GridFS(db)
+@app.get("/restaurantes/lote", tags=["Restaurantes"])
+async def obtener_restaurantes_lote(
+    ids: List[str] = Query(..., description="Ids separados por coma (o repetidos)"),
+    campos: Optional[str] = Query(None, description="Campos a devolver, p. ej. nombre,tipo_comida"),
+):
+    return await obtener_lote(db.restaurantes, ids, campos, SIN_CAMPOS_BUSQUEDA)
 
-def serialize_doc(doc):
-    doc["_id"] = str(doc["_id"])
-    for key, value in doc.items():
-        if isinstance(value, ObjectId):
-            doc[key] = str(value)
-        elif isinstance(value, list):
-            doc[key] = [str(v) if isinstance(v, ObjectId) else v for v in value]
-    return doc
 
+@app.get("/articulos/lote", tags=["Artículos"])
+async def obtener_articulos_lote(
+    ids: List[str] = Query(..., description="Ids separados por coma (o repetidos)"),
+    campos: Optional[str] = Query(None, description="Campos a devolver, p. ej. nombre,precio"),
+):
+    return await obtener_lote(db.articulos, ids, campos, SIN_CAMPOS_BUSQUEDA)
+
+
+@app.get("/ordenes/lote", tags=["Órdenes"])
+async def obtener_ordenes_lote(
+    ids: List[str] = Query(..., description="Ids separados por coma (o repetidos)"),
+    campos: Optional[str] = Query(None, description="Campos a devolver, p. ej. estado,total"),
+):
+    return await obtener_lote(db.ordenes, ids, campos)
 
-@app.get("/")
-def root():
-    return {"message": "Connected..."}
 
 # ---------------------------------------------------------------------------
 # CRUD – RESTAURANTES
@@ -62,51 +218,93 @@ def root():
 
 @app.get("/restaurantes/mejor_calificados", tags=["Restaurantes"])
 async def mejores_restaurantes():
+    # Lectura sobre el índice de promedio en lugar de agrupar todas las reseñas
+    mejores = await lectura("mejores_restaurantes").calificaciones.find(
+        {"promedio": {"$ne": None}}, sort=[("promedio", DESCENDING)], limit=10
+    )
+    restaurantes = await lectura("mejores_restaurantes").restaurantes.find_por_ids(
+        [c["_id"] for c in mejores],
+        projection={"nombre": 1, "tipo_comida": 1, "direccion": 1},
+    )
+
+    resultados = []
+    for calificacion in mejores:
+        restaurante = restaurantes.get(calificacion["_id"])
+        if not restaurante:
+            continue
+        resultados.append({
+            **restaurante,
+            "promedio_puntaje": round(calificacion["promedio"], 2),
+            "total_reseñas": calificacion["total"],
+        })
+
+    return RespuestaJSON(resultados)
+
+
+def validar_coordenadas(coords):
+    """Exige un par [long, lat] numérico y en rango, indexable por el 2dsphere."""
+    if (
+        not isinstance(coords, list)
+        or len(coords) != 2
+        or not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coords)
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="El campo 'coordenadas' debe ser una lista de dos valores [long, lat]"
+        )
+    lon, lat = coords
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise HTTPException(
+            status_code=400,
+            detail="Coordenadas fuera de rango: long en [-180, 180] y lat en [-90, 90]"
+        )
+
+
+@app.get("/restaurantes/cercanos", tags=["Restaurantes"])
+async def restaurantes_cercanos(
+    lon: float = Query(..., ge=-180, le=180, description="Longitud del punto de búsqueda"),
+    lat: float = Query(..., ge=-90, le=90, description="Latitud del punto de búsqueda"),
+    radio_m: float = Query(2000, gt=0, le=50000, description="Radio máximo en metros"),
+    tipo_comida: Optional[str] = Query(None, description="Filtrar por tipo de comida"),
+    limite: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+):
+    filtro = {}
+    if tipo_comida:
+        filtro["tipo_comida"] = tipo_comida
+
+    # $geoNear usa el índice 2dsphere de direccion.coordenadas y ya devuelve
+    # los resultados ordenados por distancia
     pipeline = [
         {
-            "$group": {
-                "_id": "$restaurante_id",
-                "promedio_puntaje": {"$avg": "$puntaje"},
-                "total_reseñas": {"$sum": 1},
-            }
-        },
-        {"$sort": {"promedio_puntaje": -1}},
-        {"$limit": 10},
-        {
-            "$lookup": {
-                "from": "restaurantes",
-                "localField": "_id",
-                "foreignField": "_id",
-                "as": "restaurante"
+            "$geoNear": {
+                "near": {"type": "Point", "coordinates": [lon, lat]},
+                "key": "direccion.coordenadas",
+                "distanceField": "distancia_m",
+                "maxDistance": radio_m,
+                "spherical": True,
+                "query": filtro,
             }
         },
-        {"$unwind": "$restaurante"},
-        {
-            "$project": {
-                "_id": "$restaurante._id",
-                "nombre": "$restaurante.nombre",
-                "tipo_comida": "$restaurante.tipo_comida",
-                "direccion": "$restaurante.direccion",
-                "promedio_puntaje": {"$round": ["$promedio_puntaje", 2]},
-                "total_reseñas": 1
-            }
-        }
+        {"$skip": skip},
+        {"$limit": limite},
+        {"$project": {"horario": 0, **SIN_CAMPOS_BUSQUEDA}},
     ]
-
-    resultados = list(db.reseñas.aggregate(pipeline))
-
-    # 🔄 Convertir ObjectId a str para todos los _id en los resultados
-    for doc in resultados:
-        doc["_id"] = str(doc["_id"])
-
-    return jsonable_encoder(resultados)
+    restaurantes = await lectura("restaurantes_cercanos").restaurantes.aggregate(pipeline)
+    for r in restaurantes:
+        r["distancia_m"] = round(r["distancia_m"], 1)
+    return RespuestaJSON(restaurantes)
 
 
 @app.post("/restaurantes", status_code=status.HTTP_201_CREATED, tags=["Restaurantes"])
 async def crear_restaurante(restaurante: dict = Body(...)):
+    direccion = restaurante.get("direccion")
+    if isinstance(direccion, dict) and "coordenadas" in direccion:
+        validar_coordenadas(direccion["coordenadas"])
     try:
         restaurante["_id"] = ObjectId()
-        db.restaurantes.insert_one(restaurante)
+        restaurante.update(campos_busqueda(restaurante.get("nombre")))
+        await db.restaurantes.insert_one(restaurante)
         return {"id": str(restaurante["_id"])}
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Restaurante duplicado")
@@ -114,38 +312,65 @@ async def crear_restaurante(restaurante: dict = Body(...)):
 
 @app.get("/restaurantes", tags=["Restaurantes"])
 async def listar_restaurantes(
-    search: Optional[str] = Query(None, description="Buscar por nombre de restaurante"),
+    search: Optional[str] = Query(None, description="Palabras (o inicios de palabra) del nombre"),
     tipo_comida: Optional[str] = Query(None, description="Filtrar por tipo de comida"),
     limite: int = Query(50, le=100),
     skip: int = Query(0, ge=0),
     sort_por: str = Query("nombre", enum=["nombre", "_id"]),
     orden: str = Query("asc", enum=["asc", "desc"]),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
 ):
     filtro = {}
 
     if search:
-        filtro["nombre"] = {"$regex": search, "$options": "i"}
+        filtro.update(filtro_palabras(search))
     if tipo_comida:
         filtro["tipo_comida"] = tipo_comida 
 
     direccion = ASCENDING if orden == "asc" else DESCENDING
-    cursor = (
-        db.restaurantes.find(filtro, projection={"horario": 0})
-        .sort(sort_por, direccion)
-        .skip(skip)
-        .limit(limite)
+    orden_sort = orden_keyset(sort_por, direccion)
+    if cursor:
+        filtro = filtro_con_cursor(filtro, cursor, orden_sort)
+        skip = 0
+    restaurantes = await lectura("listar_restaurantes").restaurantes.find(
+        filtro,
+        projection={"horario": 0, **SIN_CAMPOS_BUSQUEDA},
+        sort=orden_sort,
+        skip=skip,
+        limit=limite,
     )
-    return [serialize_doc(r) for r in cursor]
+    respuesta = RespuestaJSON(restaurantes)
+    poner_siguiente_cursor(respuesta, restaurantes, orden_sort, limite)
+    return respuesta
 
 
 @app.get(
     "/restaurantes/{restaurante_id}", tags=["Restaurantes"], response_model=dict
 )
 async def obtener_restaurante(restaurante_id: str = Path(..., description="ID del restaurante")):
-    restaurante = db.restaurantes.find_one({"_id": ObjectId(restaurante_id)})
-    if not restaurante:
-        raise HTTPException(status_code=404, detail="Restaurante no encontrado")
-    return serialize_doc(restaurante)
+    restaurante_id = id_canonico(restaurante_id)
+
+    async def cargar():
+        restaurante = await db.restaurantes.find_one(
+            {"_id": ObjectId(restaurante_id)}, SIN_CAMPOS_BUSQUEDA
+        )
+        if not restaurante:
+            raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+        return restaurante
+
+    return await leer_con_cache(
+        ("restaurante", restaurante_id), [("restaurante", restaurante_id)], cargar
+    )
+
+
+@app.get("/restaurantes/{restaurante_id}/calificacion", tags=["Restaurantes"])
+async def obtener_calificacion(restaurante_id: str):
+    oid = ObjectId(restaurante_id)
+    calificacion = await db.calificaciones.find_one({"_id": oid}) or calificacion_vacia(oid)
+    completar_histograma(calificacion)
+    if calificacion["promedio"] is not None:
+        calificacion["promedio"] = round(calificacion["promedio"], 2)
+    return RespuestaJSON(calificacion)
 
 
 @app.put("/restaurantes/{restaurante_id}", tags=["Restaurantes"])
@@ -165,32 +390,35 @@ async def actualizar_restaurante(
             status_code=400,
             detail="El campo 'tipo_comida' debe ser una lista de strings"
         )
-    if "direccion" in datos and "coordenadas" in datos["direccion"]:
-        coords = datos["direccion"]["coordenadas"]
-        if not isinstance(coords, list) or len(coords) != 2:
-            raise HTTPException(
-                status_code=400,
-                detail="El campo 'coordenadas' debe ser una lista de dos valores [long, lat]"
-            )
-    
+    if isinstance(datos.get("direccion"), dict) and "coordenadas" in datos["direccion"]:
+        validar_coordenadas(datos["direccion"]["coordenadas"])
+    if "direccion.coordenadas" in datos:
+        validar_coordenadas(datos["direccion.coordenadas"])
+
     if "_id" in datos:
         del datos["_id"]
+    if "nombre" in datos:
+        datos.update(campos_busqueda(datos["nombre"]))
 
     # Actualizar
-    result = db.restaurantes.update_one(
+    result = await db.restaurantes.update_one(
         {"_id": oid},
         {"$set": datos}
     )
 
+    invalidar_restaurante(oid)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+    if "nombre" in datos and result.modified_count:
+        propagador.restaurante_renombrado(oid)
 
     return {"mensaje": "Restaurante actualizado"}
 
 
 @app.delete("/restaurantes/{restaurante_id}", status_code=204, tags=["Restaurantes"])
 async def eliminar_restaurante(restaurante_id: str):
-    resultado = db.restaurantes.delete_one({"_id": ObjectId(restaurante_id)})
+    resultado = await db.restaurantes.delete_one({"_id": ObjectId(restaurante_id)})
+    invalidar_restaurante(restaurante_id)
     if resultado.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Restaurante no encontrado")
 
@@ -202,27 +430,38 @@ async def eliminar_restaurante(restaurante_id: str):
 @app.post("/usuarios", status_code=201, tags=["Usuarios"])
 async def crear_usuario(usuario: dict = Body(...)):
     usuario["_id"] = ObjectId()
-    db.usuarios.insert_one(usuario)
+    await db.usuarios.insert_one(usuario)
     return {"id": str(usuario["_id"])}
 
 
 @app.get("/usuarios", tags=["Usuarios"])
-async def listar_usuarios(limite: int = 50, skip: int = 0):
-    usuarios = db.usuarios.find().skip(skip).limit(limite)
-    return [serialize_doc(u) for u in usuarios]
+async def listar_usuarios(
+    limite: int = 50,
+    skip: int = 0,
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+):
+    filtro = {}
+    orden_sort = orden_keyset("_id", ASCENDING)
+    if cursor:
+        filtro = filtro_con_cursor(filtro, cursor, orden_sort)
+        skip = 0
+    usuarios = await lectura("listar_usuarios").usuarios.find(filtro, sort=orden_sort, skip=skip, limit=limite)
+    respuesta = RespuestaJSON(usuarios)
+    poner_siguiente_cursor(respuesta, usuarios, orden_sort, limite)
+    return respuesta
 
 
 @app.get("/usuarios/{usuario_id}", tags=["Usuarios"])
 async def obtener_usuario(usuario_id: str):
-    usuario = db.usuarios.find_one({"_id": ObjectId(usuario_id)})
+    usuario = await db.usuarios.find_one({"_id": ObjectId(usuario_id)})
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return serialize_doc(usuario)
+    return RespuestaJSON(usuario)
 
 
 @app.put("/usuarios/{usuario_id}", tags=["Usuarios"])
 async def actualizar_usuario(usuario_id: str, datos: dict = Body(...)):
-    resultado = db.usuarios.update_one({"_id": ObjectId(usuario_id)}, {"$set": datos})
+    resultado = await db.usuarios.update_one({"_id": ObjectId(usuario_id)}, {"$set": datos})
     if resultado.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     return {"mensaje": "Usuario actualizado"}
@@ -230,26 +469,26 @@ async def actualizar_usuario(usuario_id: str, datos: dict = Body(...)):
 
 @app.delete("/usuarios/{usuario_id}", status_code=204, tags=["Usuarios"])
 async def eliminar_usuario(usuario_id: str):
-    if db.usuarios.delete_one({"_id": ObjectId(usuario_id)}).deleted_count == 0:
+    if (await db.usuarios.delete_one({"_id": ObjectId(usuario_id)})).deleted_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
 
 @app.get("/usuarios/{usuario_id}/favoritos", tags=["Usuarios"])
 async def obtener_favoritos(usuario_id: str):
-    usuario = db.usuarios.find_one({"_id": ObjectId(usuario_id)})
+    usuario = await db.usuarios.find_one({"_id": ObjectId(usuario_id)})
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
     favoritos_ids = usuario.get("favoritos", [])
-    restaurantes = db.restaurantes.find(
+    restaurantes = await db.restaurantes.find(
         {"_id": {"$in": favoritos_ids}},
-        projection={"horario": 0}
+        projection={"horario": 0, **SIN_CAMPOS_BUSQUEDA}
     )
-    return [serialize_doc(r) for r in restaurantes]
+    return RespuestaJSON(restaurantes)
 
 @app.post("/usuarios/{usuario_id}/favorito/{restaurante_id}", status_code=201, tags=["Usuarios"])
 async def agregar_favorito(usuario_id: str, restaurante_id: str):
-    resultado = db.usuarios.update_one(
+    resultado = await db.usuarios.update_one(
         {"_id": ObjectId(usuario_id)},
         {"$addToSet": {"favoritos": ObjectId(restaurante_id)}}
     )
@@ -259,52 +498,140 @@ async def agregar_favorito(usuario_id: str, restaurante_id: str):
 
 @app.delete("/usuarios/{usuario_id}/favorito/{restaurante_id}", status_code=204, tags=["Usuarios"])
 async def eliminar_favorito(usuario_id: str, restaurante_id: str):
-    resultado = db.usuarios.update_one(
+    resultado = await db.usuarios.update_one(
         {"_id": ObjectId(usuario_id)},
         {"$pull": {"favoritos": ObjectId(restaurante_id)}}
     )
     if resultado.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-def serialize_doc(doc):
-    def convert(value):
-        if isinstance(value, ObjectId):
-            return str(value)
-        elif isinstance(value, list):
-            return [convert(item) for item in value]
-        elif isinstance(value, dict):
-            return {k: convert(v) for k, v in value.items()}
-        else:
-            return value
-
-    return {k: convert(v) for k, v in doc.items()}
-
-
 @app.get("/usuarios/{usuario_id}/ordenes", tags=["Órdenes"])
 async def listar_ordenes_usuario(usuario_id: str):
     try:
-        ordenes_cursor = db.ordenes.find(
-            {"usuario_id": ObjectId(usuario_id)}
-        ).sort("fecha", DESCENDING)
-
-        ordenes = []
-        for orden in ordenes_cursor:
-            restaurante = db.restaurantes.find_one(
-                {"_id": orden["restaurante_id"]},
-                projection={"nombre": 1}
-            )
-            # Agrega el nombre del restaurante como campo adicional
-            orden["restaurante_nombre"] = restaurante["nombre"] if restaurante else "Desconocido"
-
-            # Serializa todo, incluyendo ObjectId dentro de pedido
-            ordenes.append(serialize_doc(orden))
-
-        return ordenes
+        ordenes = await db.ordenes.find(
+            {"usuario_id": ObjectId(usuario_id)},
+            sort=[("fecha", DESCENDING)],
+        )
+        await completar_nombres_restaurante(ordenes)
+        return RespuestaJSON(ordenes)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener órdenes: {str(e)}")
 
 
+async def completar_nombres_restaurante(ordenes):
+    """Agrega ``restaurante_nombre`` a las órdenes que no lo tienen copiado.
+
+    Solo las órdenes anteriores a la copia (ver propagacion.py) cuestan una
+    consulta, un ``$in`` para todas.
+    """
+    faltantes = [orden for orden in ordenes if "restaurante_nombre" not in orden]
+    if not faltantes:
+        return
+    restaurantes = await db.restaurantes.find_por_ids(
+        [orden["restaurante_id"] for orden in faltantes], projection={"nombre": 1}
+    )
+    for orden in faltantes:
+        orden["restaurante_nombre"] = nombre_de(restaurantes.get(orden["restaurante_id"]))
+
+
+def lookup_nombre_restaurante():
+    """Etapas que agregan ``restaurante_nombre`` a cada documento con ``restaurante_id``."""
+    return [
+        {
+            "$lookup": {
+                "from": "restaurantes",
+                "localField": "restaurante_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"nombre": 1}}],
+                "as": "_restaurante",
+            }
+        },
+        {
+            "$set": {
+                "restaurante_nombre": {
+                    "$ifNull": [{"$arrayElemAt": ["$_restaurante.nombre", 0]}, SIN_NOMBRE]
+                }
+            }
+        },
+        {"$project": {"_restaurante": 0}},
+    ]
+
+
+def pipeline_panel_usuario(usuario_id, limite_ordenes, limite_resenas):
+    """Perfil, favoritos, últimas órdenes y últimas reseñas de un usuario en una agregación.
+
+    Cada ``$lookup`` parte del usuario y usa el índice de su colección
+    (``_id`` de restaurantes, ``usuario_fecha`` de órdenes y reseñas).
+    """
+    return [
+        {"$match": {"_id": ObjectId(usuario_id)}},
+        {
+            "$lookup": {
+                "from": "restaurantes",
+                "localField": "favoritos",
+                "foreignField": "_id",
+                "pipeline": [{"$project": {"horario": 0, **SIN_CAMPOS_BUSQUEDA}}],
+                "as": "favoritos_restaurantes",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "ordenes",
+                "localField": "_id",
+                "foreignField": "usuario_id",
+                # Las órdenes ya traen restaurante_nombre (ver propagacion.py)
+                "pipeline": [{"$sort": {"fecha": -1, "_id": -1}}, {"$limit": limite_ordenes}],
+                "as": "ultimas_ordenes",
+            }
+        },
+        {
+            "$lookup": {
+                "from": "reseñas",
+                "localField": "_id",
+                "foreignField": "usuario_id",
+                "pipeline": [
+                    {"$sort": {"fecha": -1, "_id": -1}},
+                    {"$limit": limite_resenas},
+                    *lookup_nombre_restaurante(),
+                ],
+                "as": "ultimas_resenas",
+            }
+        },
+    ]
+
+
+@app.get("/usuarios/{usuario_id}/panel", tags=["Usuarios"])
+async def panel_usuario(
+    usuario_id: str,
+    limite_ordenes: int = Query(5, ge=1, le=50),
+    limite_resenas: int = Query(5, ge=1, le=50),
+):
+    """Todo lo que muestra la página de usuario en un solo viaje a Mongo.
+
+    Reemplaza a ``GET /usuarios/{id}``, ``/favoritos``, ``/ordenes`` y
+    ``GET /reseñas?usuario_id=``. Las rutas ``panel`` y ``panel_separado`` de
+    ``benchmark.py`` miden ambas formas contra una base real.
+    """
+    resultado = await db.usuarios.aggregate(
+        pipeline_panel_usuario(usuario_id, limite_ordenes, limite_resenas)
+    )
+    if not resultado:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    usuario = resultado[0]
+    favoritos = usuario.pop("favoritos_restaurantes")
+    ordenes = usuario.pop("ultimas_ordenes")
+    resenas = usuario.pop("ultimas_resenas")
+    await completar_nombres_restaurante(ordenes)
+    return RespuestaJSON({
+        "usuario": usuario,
+        "favoritos": favoritos,
+        "ordenes": ordenes,
+        "resenas": resenas,
+    })
+
+
 
 
 # ---------------------------------------------------------------------------
@@ -312,35 +639,46 @@ async def listar_ordenes_usuario(usuario_id: str):
 # ---------------------------------------------------------------------------
 
 @app.post("/restaurantes/{restaurante_id}/menu/lote", tags=["Artículos"])
-async def agregar_articulos_en_lote_con_imagenes(
-    restaurante_id: str,
-    articulos_json: str = Form(...),
-    imagenes: Optional[List[UploadFile]] = File(None),
-):
+async def agregar_articulos_en_lote_con_imagenes(restaurante_id: str, request: Request):
+    """Multipart con ``articulos_json`` (lista JSON) e ``imagenes`` por índice.
+
+    Las imágenes se escriben a GridFS mientras llega el cuerpo (ver
+    subida_lote.py); si algo falla después, se borran.
+    """
+    lote = await LoteImagenes(fs.sync).recibir(request)
     try:
+        articulos_json = lote.campos.get("articulos_json")
+        if articulos_json is None:
+            raise HTTPException(status_code=400, detail="Falta el campo articulos_json")
         articulos = json.loads(articulos_json)
 
         if not isinstance(articulos, list) or not articulos:
             raise HTTPException(status_code=400, detail="La lista de artículos es inválida o vacía")
 
         nuevos_articulos = []
-        for idx, articulo in enumerate(articulos):
+        for articulo in articulos:
             articulo["_id"] = ObjectId()
             articulo["restaurante_id"] = ObjectId(restaurante_id)
-
-            # Si hay imágenes, y una corresponde a este índice
-            if imagenes and idx < len(imagenes):
-                if imagenes[idx].filename != "blob":
-                    contenido = await imagenes[idx].read()
-                    imagen_id = fs.put(contenido, filename=imagenes[idx].filename, content_type=imagenes[idx].content_type)
-                    articulo["imagen_id"] = imagen_id
-
+            articulo.update(campos_busqueda(articulo.get("nombre"), articulo.get("descripcion")))
             nuevos_articulos.append(articulo)
 
-        resultado = db.articulos.insert_many(nuevos_articulos)
+        # Las imágenes van por índice; None es una parte vacía ("sin imagen")
+        if len(lote.imagen_ids) > len(nuevos_articulos):
+            raise HTTPException(status_code=400, detail="Hay más imágenes que artículos")
+        for articulo, imagen_id in zip(nuevos_articulos, lote.imagen_ids):
+            if imagen_id is not None:
+                articulo["imagen_id"] = imagen_id
+
+        resultado = await db.articulos.insert_many(nuevos_articulos)
+        invalidar_menu(restaurante_id)
         return JSONResponse(content={"ids": [str(_id) for _id in resultado.inserted_ids]})
 
     except Exception as e:
+        for imagen_id in lote.imagen_ids:
+            if imagen_id is not None:
+                await borrar_imagen(imagen_id)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Error al insertar artículos: {str(e)}")
 
 
@@ -348,7 +686,9 @@ async def agregar_articulos_en_lote_con_imagenes(
 async def agregar_articulo(restaurante_id: str, articulo: dict = Body(...)):
     articulo["_id"] = ObjectId()
     articulo["restaurante_id"] = ObjectId(restaurante_id)
-    db.articulos.insert_one(articulo)
+    articulo.update(campos_busqueda(articulo.get("nombre"), articulo.get("descripcion")))
+    await db.articulos.insert_one(articulo)
+    invalidar_menu(restaurante_id)
     return {"id": str(articulo["_id"])}
 
 
@@ -358,57 +698,196 @@ async def listar_menu(
     tipo: Optional[str] = Query(None, description="Filtrar por tipo de platillo"),
     limite: int = 100,
 ):
+    restaurante_id = id_canonico(restaurante_id)
     filtro = {"restaurante_id": ObjectId(restaurante_id)}
     if tipo:
         filtro["tipo"] = tipo
-    articulos = db.articulos.find(filtro, projection={"descripcion": 0}).limit(limite)
-    return [serialize_doc(a) for a in articulos]
 
-@app.get("/restaurantes/{restaurante_id}/detalle", tags=["Restaurantes"])
-async def obtener_restaurante_con_articulos(restaurante_id: str):
-    restaurante = db.restaurantes.find_one({"_id": ObjectId(restaurante_id)})
-    if not restaurante:
-        raise HTTPException(status_code=404, detail="Restaurante no encontrado")
-
-    articulos = list(
-        db.articulos.find(
-            {"restaurante_id": ObjectId(restaurante_id)}
+    async def cargar():
+        return await db.articulos.find(
+            filtro, projection={"descripcion": 0, **SIN_CAMPOS_BUSQUEDA}, limit=limite
         )
+
+    return await leer_con_cache(
+        ("menu", restaurante_id, tipo, limite), [("menu", restaurante_id)], cargar
     )
 
-    return {
-        "restaurante": serialize_doc(restaurante),
-        "articulos": [serialize_doc(a) for a in articulos]
-    }
+def pipeline_detalle(restaurante_id, tipo, skip, limite):
+    """Restaurante y una página de su menú en una sola agregación.
+
+    El ``$lookup`` (sintaxis de MongoDB 5.0: ``localField`` más ``pipeline``)
+    usa el índice ``restaurante_tipo`` y su ``$facet`` devuelve, además de la
+    página, cuántos artículos hay de cada tipo para armar las secciones.
+    """
+    filtro_tipo = [{"$match": {"tipo": tipo}}] if tipo else []
+    return [
+        {"$match": {"_id": ObjectId(restaurante_id)}},
+        {"$project": SIN_CAMPOS_BUSQUEDA},
+        {
+            "$lookup": {
+                "from": "articulos",
+                "localField": "_id",
+                "foreignField": "restaurante_id",
+                "pipeline": [
+                    {"$project": {"restaurante_id": 0, **SIN_CAMPOS_BUSQUEDA}},
+                    {
+                        "$facet": {
+                            "secciones": [
+                                {"$unwind": {"path": "$tipo", "preserveNullAndEmptyArrays": True}},
+                                {"$group": {"_id": "$tipo", "total": {"$sum": 1}}},
+                                {"$sort": {"_id": 1}},
+                            ],
+                            "articulos": filtro_tipo + [
+                                {"$sort": {"nombre": 1, "_id": 1}},
+                                {"$skip": skip},
+                                {"$limit": limite},
+                            ],
+                            "total": filtro_tipo + [{"$count": "n"}],
+                        }
+                    },
+                ],
+                "as": "menu",
+            }
+        },
+    ]
+
+
+@app.get("/restaurantes/{restaurante_id}/detalle", tags=["Restaurantes"])
+async def obtener_restaurante_con_articulos(
+    restaurante_id: str,
+    tipo: Optional[str] = Query(None, description="Solo los artículos de este tipo"),
+    skip: int = Query(0, ge=0),
+    limite: int = Query(50, ge=1, le=100, description="Artículos por página"),
+):
+    restaurante_id = id_canonico(restaurante_id)
+
+    async def cargar():
+        resultado = await db.restaurantes.aggregate(
+            pipeline_detalle(restaurante_id, tipo, skip, limite)
+        )
+        if not resultado:
+            raise HTTPException(status_code=404, detail="Restaurante no encontrado")
+
+        restaurante = resultado[0]
+        menu = restaurante.pop("menu")[0]
+        total = menu["total"][0]["n"] if menu["total"] else 0
+        return {
+            "restaurante": restaurante,
+            "articulos": menu["articulos"],
+            "secciones": [{"tipo": s["_id"], "total": s["total"]} for s in menu["secciones"]],
+            "total": total,
+            "skip": skip,
+            "limite": limite,
+        }
 
+    return await leer_con_cache(
+        ("detalle", restaurante_id, tipo, skip, limite),
+        [("restaurante", restaurante_id), ("menu", restaurante_id)],
+        cargar,
+    )
 
 
 @app.get("/articulos/{articulo_id}", tags=["Artículos"])
 async def obtener_articulo(articulo_id: str):
-    articulo = db.articulos.find_one({"_id": ObjectId(articulo_id)})
-    if not articulo:
-        raise HTTPException(status_code=404, detail="Artículo no encontrado")
-    return serialize_doc(articulo)
+    articulo_id = id_canonico(articulo_id)
+
+    async def cargar():
+        articulo = await db.articulos.find_one({"_id": ObjectId(articulo_id)}, SIN_CAMPOS_BUSQUEDA)
+        if not articulo:
+            raise HTTPException(status_code=404, detail="Artículo no encontrado")
+        return articulo
+
+    return await leer_con_cache(
+        ("articulo", articulo_id), [("articulo", articulo_id)], cargar
+    )
 
 
 @app.put("/articulos/{articulo_id}", tags=["Artículos"])
 async def actualizar_articulo(articulo_id: str, datos: dict = Body(...)):
-    resultado = db.articulos.update_one({"_id": ObjectId(articulo_id)}, {"$set": datos})
-    if resultado.matched_count == 0:
+    # Documento previo: dice de qué menú hay que invalidar
+    anterior = await db.articulos.find_one_and_update(
+        {"_id": ObjectId(articulo_id)},
+        {"$set": datos},
+        projection={"restaurante_id": 1, "nombre": 1, "descripcion": 1},
+    )
+    if not anterior:
         raise HTTPException(status_code=404, detail="Artículo no encontrado")
+    if "nombre" in datos and datos["nombre"] != anterior.get("nombre"):
+        propagador.articulo_renombrado(anterior["_id"])
+    if "nombre" in datos or "descripcion" in datos:
+        actual = {**anterior, **datos}
+        await db.articulos.update_one(
+            {"_id": anterior["_id"]},
+            {"$set": campos_busqueda(actual.get("nombre"), actual.get("descripcion"))},
+        )
+    invalidar_articulo(anterior)
+    if "restaurante_id" in datos:
+        invalidar_menu(datos["restaurante_id"])
     return {"mensaje": "Artículo actualizado"}
 
 
 @app.delete("/articulos/{articulo_id}", status_code=204, tags=["Artículos"])
 async def eliminar_articulo(articulo_id: str):
-    if db.articulos.delete_one({"_id": ObjectId(articulo_id)}).deleted_count == 0:
+    articulo = await db.articulos.find_one_and_delete(
+        {"_id": ObjectId(articulo_id)}, projection={"restaurante_id": 1}
+    )
+    if not articulo:
         raise HTTPException(status_code=404, detail="Artículo no encontrado")
+    invalidar_articulo(articulo)
+
+
+# ---------------------------------------------------------------------------
+# BÚSQUEDA – typeahead por prefijo (ver busqueda.py)
+# ---------------------------------------------------------------------------
+
+@app.get("/buscar/restaurantes", tags=["Búsqueda"])
+async def buscar_restaurantes(
+    q: str = Query(..., min_length=1, description="Texto escrito hasta ahora"),
+    tipo_comida: Optional[str] = Query(None),
+    limite: int = Query(10, ge=1, le=50),
+):
+    filtro = {"tipo_comida": tipo_comida} if tipo_comida else None
+    restaurantes = await buscar(
+        db.restaurantes, q, limite, filtro,
+        projection={"nombre": 1, "tipo_comida": 1, "direccion.ciudad": 1},
+    )
+    return RespuestaJSON(restaurantes)
+
+
+@app.get("/buscar/articulos", tags=["Búsqueda"])
+async def buscar_articulos(
+    q: str = Query(..., min_length=1, description="Texto escrito hasta ahora"),
+    restaurante_id: Optional[str] = Query(None, description="Solo el menú de este restaurante"),
+    limite: int = Query(10, ge=1, le=50),
+):
+    filtro = {"restaurante_id": ObjectId(restaurante_id)} if restaurante_id else None
+    articulos = await buscar(
+        db.articulos, q, limite, filtro,
+        projection={"nombre": 1, "precio": 1, "tipo": 1, "restaurante_id": 1, "imagen_id": 1},
+    )
+    return RespuestaJSON(articulos)
 
 
 # ---------------------------------------------------------------------------
 # CRUD – ÓRDENES
 # ---------------------------------------------------------------------------
 
+async def resolver_nombres_pedido(pedido):
+    """Convierte los ``articuloId`` a ObjectId y copia el nombre de cada artículo.
+
+    Todos los artículos del pedido se resuelven con una sola consulta ``$in``.
+    """
+    for item in pedido:
+        item["articuloId"] = ObjectId(item["articuloId"])
+
+    articulos = await db.articulos.find_por_ids(
+        [item["articuloId"] for item in pedido], projection={"nombre": 1}
+    )
+    for item in pedido:
+        articulo = articulos.get(item["articuloId"])
+        item["nombre"] = nombre_de(articulo)
+
+
 @app.put("/ordenes/cambiar_estado", tags=["Órdenes"])
 async def cambiar_estado_masivo(
     restaurante_id: str = Body(...),
@@ -416,14 +895,11 @@ async def cambiar_estado_masivo(
     nuevo_estado: str = Body(...)
 ):
     try:
-        result = db.ordenes.update_many(
-            {
-                "restaurante_id": ObjectId(restaurante_id),
-                "estado": estado_actual,
-            },
-            {"$set": {"estado": nuevo_estado}}
+        # Actualiza y ajusta ventas_diarias con las mismas órdenes (ver ventas.py)
+        modificados = await cambiar_estado(
+            db, {"restaurante_id": ObjectId(restaurante_id)}, estado_actual, nuevo_estado
         )
-        return {"modificados": result.modified_count}
+        return {"modificados": modificados}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
 
@@ -435,27 +911,144 @@ async def crear_orden(orden: dict = Body(...)):
     orden["restaurante_id"] = ObjectId(orden["restaurante_id"])
     orden["fecha"] = datetime.utcnow()
     orden["estado"] = orden.get("estado", "Pendiente")  # por si frontend no lo manda
-    for item in orden["pedido"]:
-        item["articuloId"] = ObjectId(item["articuloId"])
-
-        articulo = db.articulos.find_one({"_id": item["articuloId"]}, {"nombre": 1})
-        item["nombre"] = articulo["nombre"] if articulo else "Desconocido"
-
+    restaurante, _ = await asyncio.gather(
+        db.restaurantes.find_one({"_id": orden["restaurante_id"]}, {"nombre": 1}),
+        resolver_nombres_pedido(orden["pedido"]),
+    )
+    orden["restaurante_nombre"] = nombre_de(restaurante)
 
     orden["total"] = sum(i["precio"] * i["cantidad"] for i in orden["pedido"])
-    db.ordenes.insert_one(orden)
+    await db.ordenes.insert_one(orden)
+    await ajustar_ventas(db, agregar=[orden])
     return {"id": str(orden["_id"])}
 
 
-@app.get("/ordenes", tags=["Órdenes"])
-async def listar_ordenes(
-    usuario_id: Optional[str] = Query(None),
-    restaurante_id: Optional[str] = Query(None),
-    estado: Optional[str] = Query(None),
-    desde: Optional[datetime] = Query(None),
-    hasta: Optional[datetime] = Query(None),
-    limite: int = 100,
-):
+MAX_ORDENES_LOTE = 1000
+
+
+class LoteOrdenesPayload(BaseModel):
+    ordenes: List[dict]
+
+
+def armar_orden_lote(orden, articulos, restaurantes, fecha):
+    """Valida una orden del lote y la arma con nombres y precios del catálogo.
+
+    Lanza ``ValueError`` con el motivo si la orden no es válida.
+    """
+    for campo in ("usuario_id", "restaurante_id"):
+        if not orden.get(campo):
+            raise ValueError(f"Falta el campo {campo}")
+    try:
+        usuario_id = ObjectId(orden["usuario_id"])
+        restaurante_id = ObjectId(orden["restaurante_id"])
+    except Exception:
+        raise ValueError("usuario_id o restaurante_id inválido")
+
+    pedido = orden.get("pedido")
+    if not isinstance(pedido, list):
+        raise ValueError("El pedido debe ser una lista")
+    if not pedido:
+        raise ValueError("El pedido está vacío")
+
+    items = []
+    for item in pedido:
+        if not isinstance(item, dict):
+            raise ValueError("Cada artículo del pedido debe ser un objeto")
+        articulo = articulos.get(str(item.get("articuloId")))
+        if articulo is None:
+            raise ValueError(f"Artículo no encontrado: {item.get('articuloId')}")
+        if articulo.get("restaurante_id") != restaurante_id:
+            raise ValueError(f"El artículo {articulo['_id']} no es de este restaurante")
+        cantidad = item.get("cantidad")
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 1:
+            raise ValueError("La cantidad debe ser un entero positivo")
+        items.append({
+            "articuloId": articulo["_id"],
+            "nombre": nombre_de(articulo),
+            "cantidad": cantidad,
+            "precio": articulo.get("precio", 0),
+        })
+
+    return {
+        "_id": ObjectId(),
+        "usuario_id": usuario_id,
+        "restaurante_id": restaurante_id,
+        "restaurante_nombre": nombre_de(restaurantes.get(restaurante_id)),
+        "fecha": fecha,
+        "estado": orden.get("estado", "Pendiente"),
+        "pedido": items,
+        "total": sum(i["precio"] * i["cantidad"] for i in items),
+    }
+
+
+@app.post("/ordenes/lote", tags=["Órdenes"])
+async def crear_ordenes_lote(payload: LoteOrdenesPayload):
+    """Crea muchas órdenes con una consulta de artículos y un solo ``bulk_write``.
+
+    Los precios y el total salen del catálogo, no del cliente. Cada orden se
+    valida por separado y la respuesta trae un resultado por índice.
+    """
+    ordenes = payload.ordenes
+    if not ordenes:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if len(ordenes) > MAX_ORDENES_LOTE:
+        raise HTTPException(
+            status_code=413, detail=f"Máximo {MAX_ORDENES_LOTE} órdenes por lote"
+        )
+
+    ids_articulos = set()
+    for orden in ordenes:
+        pedido = orden.get("pedido")
+        for item in pedido if isinstance(pedido, list) else []:
+            if not isinstance(item, dict):
+                continue  # armar_orden_lote rechaza la orden
+            try:
+                ids_articulos.add(ObjectId(item.get("articuloId")))
+            except Exception:
+                pass  # armar_orden_lote lo reporta como no encontrado
+    encontrados = await db.articulos.find_por_ids(
+        list(ids_articulos), projection={"nombre": 1, "precio": 1, "restaurante_id": 1}
+    )
+    articulos = {str(_id): articulo for _id, articulo in encontrados.items()}
+    # Los artículos ya dicen de qué restaurante son: un $in para sus nombres
+    restaurantes = await db.restaurantes.find_por_ids(
+        list({a.get("restaurante_id") for a in encontrados.values()}), projection={"nombre": 1}
+    )
+
+    fecha = datetime.utcnow()
+    resultados = [None] * len(ordenes)
+    documentos, indices = [], []
+    for i, orden in enumerate(ordenes):
+        try:
+            documento = armar_orden_lote(orden, articulos, restaurantes, fecha)
+        except ValueError as e:
+            resultados[i] = {"indice": i, "ok": False, "error": str(e)}
+            continue
+        documentos.append(documento)
+        indices.append(i)
+
+    errores_escritura = {}
+    if documentos:
+        try:
+            await db.ordenes.bulk_write([InsertOne(d) for d in documentos], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errores_escritura[error["index"]] = error.get("errmsg", "Error de escritura")
+
+    insertadas = []
+    for posicion, (i, documento) in enumerate(zip(indices, documentos)):
+        if posicion in errores_escritura:
+            resultados[i] = {"indice": i, "ok": False, "error": errores_escritura[posicion]}
+        else:
+            insertadas.append(documento)
+            resultados[i] = {"indice": i, "ok": True, "id": str(documento["_id"]), "total": documento["total"]}
+    await ajustar_ventas(db, agregar=insertadas)
+
+    creadas = sum(1 for r in resultados if r["ok"])
+    return {"creadas": creadas, "fallidas": len(resultados) - creadas, "resultados": resultados}
+
+
+def filtro_consulta(usuario_id, restaurante_id, estado, desde, hasta):
     filtro = {}
 
     if usuario_id:
@@ -471,53 +1064,153 @@ async def listar_ordenes(
         if hasta:
             rango["$lte"] = hasta
         filtro["fecha"] = rango
+    return filtro
+
+
+@app.get("/ordenes", tags=["Órdenes"])
+async def listar_ordenes(
+    usuario_id: Optional[str] = Query(None),
+    restaurante_id: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    limite: int = 100,
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+):
+    filtro = filtro_consulta(usuario_id, restaurante_id, estado, desde, hasta)
+
+    orden_sort = orden_keyset("fecha", DESCENDING)
+    if cursor:
+        filtro = filtro_con_cursor(filtro, cursor, orden_sort)
+    ordenes = await db.ordenes.find(filtro, sort=orden_sort, limit=limite)
+    respuesta = RespuestaJSON(ordenes)
+    poner_siguiente_cursor(respuesta, ordenes, orden_sort, limite)
+    return respuesta
+
+
+@app.get("/ordenes/exportar", tags=["Órdenes"])
+async def exportar_ordenes(
+    formato: str = Query("ndjson", enum=["ndjson", "csv"]),
+    usuario_id: Optional[str] = Query(None),
+    restaurante_id: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+):
+    filtro = filtro_consulta(usuario_id, restaurante_id, estado, desde, hasta)
+    lotes = lectura("exportar_ordenes").ordenes.iterar_lotes(filtro, sort=orden_keyset("fecha", DESCENDING))
+    contenido, media_type = exportar(lotes, formato, COLUMNAS_ORDENES)
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="ordenes.{formato}"'},
+    )
+
+
+@app.get("/restaurantes/{restaurante_id}/ordenes/eventos", tags=["Órdenes"])
+async def eventos_ordenes_restaurante(
+    restaurante_id: str,
+    request: Request,
+    ultimo_id: Optional[str] = Query(None, description="Alternativa a Last-Event-ID"),
+):
+    """Feed SSE de altas, cambios y bajas de órdenes del restaurante (ver feed_ordenes.py)."""
+    if not feed_ordenes.disponible:
+        raise HTTPException(status_code=503, detail="Feed en tiempo real no disponible")
+    try:
+        ObjectId(restaurante_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID inválido")
 
-    ordenes = (
-        db.ordenes.find(filtro)
-        .sort("fecha", DESCENDING)
-        .limit(limite)
+    ultimo_id = request.headers.get("last-event-id") or ultimo_id
+    return StreamingResponse(
+        eventos_sse(feed_ordenes, restaurante_id, ultimo_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return [serialize_doc(o) for o in ordenes]
 
 
 @app.get("/ordenes/{orden_id}", tags=["Órdenes"])
 async def obtener_orden(orden_id: str):
-    orden = db.ordenes.find_one({"_id": ObjectId(orden_id)})
+    orden = await db.ordenes.find_one({"_id": ObjectId(orden_id)})
     if not orden:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
-    return serialize_doc(orden)
+    return RespuestaJSON(orden)
+
+
+def validar_campos_venta(datos):
+    """Convierte ``fecha`` y ``restaurante_id`` a sus tipos y exige números en totales y pedido."""
+    if "fecha" in datos:
+        fecha = datos["fecha"]
+        try:
+            fecha = fecha if isinstance(fecha, datetime) else datetime.fromisoformat(fecha)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Fecha inválida (se espera ISO 8601)")
+        if fecha.tzinfo is not None:
+            fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+        datos["fecha"] = fecha
+    if "restaurante_id" in datos:
+        try:
+            datos["restaurante_id"] = ObjectId(datos["restaurante_id"])
+        except Exception:
+            raise HTTPException(status_code=400, detail="restaurante_id inválido")
+    total = datos.get("total")
+    if "total" in datos and (not isinstance(total, (int, float)) or isinstance(total, bool)):
+        raise HTTPException(status_code=400, detail="El total debe ser numérico")
+    if "pedido" in datos:
+        pedido = datos["pedido"]
+        if not isinstance(pedido, list) or not all(
+            isinstance(i, dict)
+            and "articuloId" in i
+            and all(
+                isinstance(i.get(c), (int, float)) and not isinstance(i.get(c), bool)
+                for c in ("cantidad", "precio")
+            )
+            for i in pedido
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="Cada artículo del pedido necesita articuloId, cantidad y precio numéricos",
+            )
 
 
 @app.put("/ordenes/{orden_id}", tags=["Órdenes"])
 async def actualizar_orden(orden_id: str, datos: dict = Body(...)):
+    # Lo que usa ventas_diarias se valida antes de escribir: después del $set
+    # ya no se puede deshacer el cambio si el ajuste del resumen falla
+    validar_campos_venta(datos)
+    if "restaurante_id" in datos:
+        # Como en crear_orden: la copia del nombre sigue al restaurante nuevo
+        restaurante = await db.restaurantes.find_one({"_id": datos["restaurante_id"]}, {"nombre": 1})
+        datos["restaurante_nombre"] = nombre_de(restaurante)
     if "pedido" in datos:
-        for item in datos["pedido"]:
-            item["articuloId"] = ObjectId(item["articuloId"])
-            articulo = db.articulos.find_one({"_id": item["articuloId"]}, {"nombre": 1})
-            item["nombre"] = articulo["nombre"] if articulo else "Desconocido"
+        await resolver_nombres_pedido(datos["pedido"])
         datos["total"] = sum(i["precio"] * i["cantidad"] for i in datos["pedido"])
     
     if "estado" in datos:
         # Asegúrate de que sea un valor válido (opcional)
         if datos["estado"] not in ["Pendiente", "Preparando", "Entregado"]:
             raise HTTPException(status_code=400, detail="Estado no válido")
-    
-    resultado = db.ordenes.update_one(
+
+    anterior = await db.ordenes.find_one_and_update(
         {"_id": ObjectId(orden_id)},
         {"$set": datos}
     )
 
-    if resultado.matched_count == 0:
+    if anterior is None:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
-    
+
+    if any(campo in datos for campo in ("estado", "total", "pedido", "fecha", "restaurante_id")):
+        await ajustar_ventas(db, quitar=[anterior], agregar=[{**anterior, **datos}])
     return {"mensaje": "Orden actualizada"}
 
 
 
 @app.delete("/ordenes/{orden_id}", status_code=204, tags=["Órdenes"])
 async def eliminar_orden(orden_id: str):
-    if db.ordenes.delete_one({"_id": ObjectId(orden_id)}).deleted_count == 0:
+    orden = await db.ordenes.find_one_and_delete({"_id": ObjectId(orden_id)})
+    if orden is None:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
+    await ajustar_ventas(db, quitar=[orden])
 
 
 class DeleteManyPayload(BaseModel):
@@ -527,12 +1220,93 @@ class DeleteManyPayload(BaseModel):
 async def eliminar_multiples_ordenes(payload: DeleteManyPayload):
     try:
         object_ids = [ObjectId(oid) for oid in payload.ids]
-        resultado = db.ordenes.delete_many({"_id": {"$in": object_ids}})
-        if resultado.deleted_count == 0:
+        # Resta de ventas_diarias solo lo que borró esta petición (ver ventas.py)
+        if await borrar_ordenes(db, object_ids) == 0:
             raise HTTPException(status_code=404, detail="No se eliminaron órdenes")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error al eliminar órdenes: {str(e)}")
 
+# ---------------------------------------------------------------------------
+# ANALÍTICA – VENTAS (lee solo ventas_diarias, ver ventas.py)
+# ---------------------------------------------------------------------------
+
+def filtro_ventas(desde, hasta, estado):
+    filtro = {}
+    if desde or hasta:
+        filtro["dia"] = {}
+        if desde:
+            filtro["dia"]["$gte"] = datetime(desde.year, desde.month, desde.day)
+        if hasta:
+            filtro["dia"]["$lte"] = datetime(hasta.year, hasta.month, hasta.day)
+    if estado:
+        filtro["estado"] = {"$in": estado}
+    return filtro
+
+
+@app.get("/restaurantes/{restaurante_id}/ventas", tags=["Analítica"])
+async def ventas_restaurante(
+    restaurante_id: str,
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    agrupar: str = Query("dia", enum=["dia", "mes", "anio"]),
+    estado: Optional[List[str]] = Query(None, description="Solo estos estados (repetible)"),
+):
+    filtro = filtro_ventas(desde, hasta, estado)
+    filtro["restaurante_id"] = ObjectId(restaurante_id)
+    filas = await lectura("ventas_restaurante").ventas_diarias.find(filtro, sort=[("dia", ASCENDING)])
+
+    periodos, totales = {}, {"ordenes": 0, "ingresos": 0, "articulos": 0}
+    for fila in filas:
+        if not fila["ordenes"]:
+            continue  # quedan en cero cuando se borran o mueven todas las órdenes del día
+        nombre = periodo_de(fila["dia"], agrupar)
+        periodo = periodos.setdefault(nombre, {
+            "periodo": nombre, "ordenes": 0, "ingresos": 0, "articulos": 0, "por_estado": {},
+        })
+        por_estado = periodo["por_estado"].setdefault(
+            fila["estado"], {"ordenes": 0, "ingresos": 0, "articulos": 0}
+        )
+        for campo in totales:
+            periodo[campo] += fila[campo]
+            por_estado[campo] += fila[campo]
+            totales[campo] += fila[campo]
+
+    return RespuestaJSON({"totales": totales, "periodos": list(periodos.values())})
+
+
+@app.get("/ventas/ranking", tags=["Analítica"])
+async def ranking_ventas(
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    estado: Optional[List[str]] = Query(None, description="Solo estos estados (repetible)"),
+    limite: int = Query(10, ge=1, le=100),
+):
+    pipeline = [
+        {"$match": filtro_ventas(desde, hasta, estado)},
+        {
+            "$group": {
+                "_id": "$restaurante_id",
+                "ordenes": {"$sum": "$ordenes"},
+                "ingresos": {"$sum": "$ingresos"},
+                "articulos": {"$sum": "$articulos"},
+            }
+        },
+        {"$sort": {"ingresos": -1, "_id": 1}},
+        {"$limit": limite},
+    ]
+    filas = await lectura("ranking_ventas").ventas_diarias.aggregate(pipeline)
+    restaurantes = await lectura("ranking_ventas").restaurantes.find_por_ids(
+        [f["_id"] for f in filas], projection={"nombre": 1}
+    )
+    for fila in filas:
+        restaurante = restaurantes.get(fila["_id"])
+        fila["restaurante_id"] = fila.pop("_id")
+        fila["nombre"] = restaurante["nombre"] if restaurante else None
+    return RespuestaJSON(filas)
+
+
 # ---------------------------------------------------------------------------
 # CRUD – IMAGENES
 # ---------------------------------------------------------------------------
@@ -541,41 +1315,74 @@ from fastapi import UploadFile
 
 @app.post("/articulos/{articulo_id}/imagen", tags=["Imágenes"])
 async def subir_imagen_articulo(articulo_id: str, file: UploadFile = File(...)):
-    contenido = await file.read()
-
-    articulo = db.articulos.find_one({"_id": ObjectId(articulo_id)})
+    articulo = await db.articulos.find_one({"_id": ObjectId(articulo_id)})
     if articulo and "imagen_id" in articulo:
-        fs.delete(ObjectId(articulo["imagen_id"]))
+        await borrar_imagen(ObjectId(articulo["imagen_id"]))
 
-    imagen_id = fs.put(contenido, filename=file.filename, content_type=file.content_type)
+    imagen_id = await guardar_imagen(file)
 
-    db.articulos.update_one(
+    await db.articulos.update_one(
         {"_id": ObjectId(articulo_id)},
         {"$set": {"imagen_id": imagen_id}}
     )
+    if articulo:
+        invalidar_articulo(articulo)
     return {"mensaje": "Imagen subida correctamente", "imagen_id": str(imagen_id)}
 
+async def guardar_imagen(archivo: UploadFile):
+    """Sube un archivo a GridFS leyéndolo por chunks, sin cargarlo completo.
+
+    ``UploadFile.file`` ya está en un archivo temporal; GridFS lo lee de a un
+    chunk (255 KB) por escritura dentro del threadpool.
+    """
+    await archivo.seek(0)
+    return await fs.put(archivo.file, filename=archivo.filename, content_type=archivo.content_type)
+
+
+async def borrar_imagen(imagen_id):
+    """Elimina la imagen de GridFS y de la caché en memoria."""
+    cache_imagenes.descartar(imagen_id)
+    await fs.delete(imagen_id)
+
+
 @app.get("/imagenes/{imagen_id}", tags=["Imágenes"])
-def obtener_imagen(imagen_id: str):
+async def obtener_imagen(imagen_id: str, request: Request):
     try:
-        grid_out = fs.get(ObjectId(imagen_id))
-        return StreamingResponse(grid_out, media_type=grid_out.content_type)
+        oid = ObjectId(imagen_id)
+        sin_cambios = respuesta_sin_cambios(oid, request.headers)
+        if sin_cambios is not None:
+            return sin_cambios
+        en_cache = cache_imagenes.obtener(oid)
+        if en_cache:
+            meta, datos = en_cache
+            return responder_imagen(meta, request.headers, datos=datos)
+
+        grid_out = await fs.get(oid)
     except Exception:
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
 
+    meta = MetaImagen.desde_grid_out(grid_out)
+    if not cache_imagenes.cabe(meta.longitud):
+        return responder_imagen(meta, request.headers, grid_out=grid_out)
+
+    datos = await en_hilo(grid_out.read)
+    cache_imagenes.guardar(oid, meta, datos)
+    return responder_imagen(meta, request.headers, datos=datos)
+
 @app.delete("/imagenes/{imagen_id}", tags=["Imágenes"])
-def eliminar_imagen(imagen_id: str):
+async def eliminar_imagen(imagen_id: str):
     try:
-        articulo = db.articulos.find_one({"imagen_id": ObjectId(imagen_id)})
+        articulo = await db.articulos.find_one({"imagen_id": ObjectId(imagen_id)})
         if not articulo:
             raise HTTPException(status_code=404, detail="Artículo no encontrado con esta imagen")
 
-        fs.delete(ObjectId(imagen_id))
+        await borrar_imagen(ObjectId(imagen_id))
 
-        db.articulos.update_one(
+        await db.articulos.update_one(
             {"_id": articulo["_id"]},
             {"$unset": {"imagen_id": ""}}
         )
+        invalidar_articulo(articulo)
 
         return {"mensaje": "Imagen eliminada correctamente"}
     except Exception as e:
@@ -583,28 +1390,27 @@ def eliminar_imagen(imagen_id: str):
 
 @app.put("/articulos/{articulo_id}/imagen", tags=["Imágenes"])
 async def actualizar_imagen_articulo(articulo_id: str, file: UploadFile = File(...)):
-    contenido = await file.read()
-
     # Buscar el artículo
-    articulo = db.articulos.find_one({"_id": ObjectId(articulo_id)})
+    articulo = await db.articulos.find_one({"_id": ObjectId(articulo_id)})
     if not articulo:
         raise HTTPException(status_code=404, detail="Artículo no encontrado")
 
     # Eliminar imagen anterior si existe
     if "imagen_id" in articulo:
         try:
-            fs.delete(ObjectId(articulo["imagen_id"]))
+            await borrar_imagen(ObjectId(articulo["imagen_id"]))
         except Exception:
             pass  # Imagen ya no existe o ya fue eliminada
 
     # Subir nueva imagen
-    nueva_imagen_id = fs.put(contenido, filename=file.filename, content_type=file.content_type)
+    nueva_imagen_id = await guardar_imagen(file)
 
     # Actualizar referencia en el documento
-    db.articulos.update_one(
+    await db.articulos.update_one(
         {"_id": ObjectId(articulo_id)},
         {"$set": {"imagen_id": nueva_imagen_id}}
     )
+    invalidar_articulo(articulo)
 
     return {"mensaje": "Imagen actualizada correctamente", "imagen_id": str(nueva_imagen_id)}
 
@@ -617,23 +1423,23 @@ async def actualizar_imagen_articulo(
         print("Si entra perro")
 
         # Verifica si el artículo existe
-        articulo = db.articulos.find_one({"_id": ObjectId(articulo_id)})
+        articulo = await db.articulos.find_one({"_id": ObjectId(articulo_id)})
         if not articulo:
             raise HTTPException(status_code=404, detail="Artículo no encontrado")
 
         # Elimina imagen anterior si hay
         if "imagen_id" in articulo:
-            fs.delete(ObjectId(articulo["imagen_id"]))
+            await borrar_imagen(ObjectId(articulo["imagen_id"]))
 
         # Guarda nueva imagen en GridFS
-        contenido = await imagen.read()
-        imagen_id = fs.put(contenido, filename=imagen.filename, content_type=imagen.content_type)
+        imagen_id = await guardar_imagen(imagen)
 
         # Actualiza referencia
-        db.articulos.update_one(
+        await db.articulos.update_one(
             {"_id": ObjectId(articulo_id)},
             {"$set": {"imagen_id": imagen_id, "imagen_nombre": imagen.filename}}
         )
+        invalidar_articulo(articulo)
 
         return {"mensaje": "Imagen actualizada"}
     except Exception as e:
@@ -646,13 +1452,20 @@ async def actualizar_imagen_articulo(
 # ---------------------------------------------------------------------------
 
 
+def validar_puntaje(puntaje):
+    if not puntaje_valido(puntaje):
+        raise HTTPException(status_code=400, detail="El puntaje debe ser un entero de 1 a 5")
+
+
 @app.post("/reseñas", status_code=201, tags=["Reseñas"])
 async def agregar_resena(resena: dict = Body(...)):
     resena["_id"] = ObjectId()
     resena["usuario_id"] = ObjectId(resena["usuario_id"])
     resena["restaurante_id"] = ObjectId(resena["restaurante_id"])
     resena["fecha"] = datetime.utcnow()
-    db.reseñas.insert_one(resena)
+    validar_puntaje(resena.get("puntaje"))
+    await db.reseñas.insert_one(resena)
+    await ajustar_calificacion(db, resena["restaurante_id"], resena["puntaje"], 1)
     return {"id": str(resena["_id"])}
 
 
@@ -663,6 +1476,7 @@ async def listar_resenas(
     limite: int = 100,
     sort: str = Query("fecha", enum=["fecha", "puntaje"]),
     orden: str = Query("desc", enum=["asc", "desc"]),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
 ):
     filtro = {}
     if restaurante_id:
@@ -670,28 +1484,68 @@ async def listar_resenas(
     if usuario_id:
         filtro["usuario_id"] = ObjectId(usuario_id)
     direccion = ASCENDING if orden == "asc" else DESCENDING
-    resenas = db.reseñas.find(filtro).sort(sort, direccion).limit(limite)
-    return [serialize_doc(r) for r in resenas]
+    orden_sort = orden_keyset(sort, direccion)
+    if cursor:
+        filtro = filtro_con_cursor(filtro, cursor, orden_sort)
+    resenas = await lectura("listar_resenas").reseñas.find(filtro, sort=orden_sort, limit=limite)
+    respuesta = RespuestaJSON(resenas)
+    poner_siguiente_cursor(respuesta, resenas, orden_sort, limite)
+    return respuesta
+
+
+@app.get("/reseñas/exportar", tags=["Reseñas"])
+async def exportar_resenas(
+    formato: str = Query("ndjson", enum=["ndjson", "csv"]),
+    restaurante_id: Optional[str] = Query(None),
+    usuario_id: Optional[str] = Query(None),
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+):
+    filtro = filtro_consulta(usuario_id, restaurante_id, None, desde, hasta)
+    lotes = lectura("exportar_resenas").reseñas.iterar_lotes(filtro, sort=orden_keyset("fecha", DESCENDING))
+    contenido, media_type = exportar(lotes, formato, COLUMNAS_RESENAS)
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="resenas.{formato}"'},
+    )
 
 
 @app.get("/reseñas/{resena_id}", tags=["Reseñas"])
 async def obtener_resena(resena_id: str):
-    resena = db.reseñas.find_one({"_id": ObjectId(resena_id)})
+    resena = await db.reseñas.find_one({"_id": ObjectId(resena_id)})
     if not resena:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
-    return serialize_doc(resena)
+    return RespuestaJSON(resena)
 
 
 @app.put("/reseñas/{resena_id}", tags=["Reseñas"])
 async def actualizar_resena(resena_id: str, datos: dict = Body(...)):
-    resultado = db.reseñas.update_one({"_id": ObjectId(resena_id)}, {"$set": datos})
-    if resultado.matched_count == 0:
+    datos.pop("_id", None)
+    if "puntaje" in datos:
+        validar_puntaje(datos["puntaje"])
+    if "restaurante_id" in datos:
+        datos["restaurante_id"] = ObjectId(datos["restaurante_id"])
+
+    anterior = await db.reseñas.find_one_and_update(
+        {"_id": ObjectId(resena_id)}, {"$set": datos}
+    )
+    if not anterior:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
+
+    # Mueve la reseña en las estadísticas si cambió el puntaje o el restaurante
+    nuevo_restaurante = datos.get("restaurante_id", anterior["restaurante_id"])
+    nuevo_puntaje = datos.get("puntaje", anterior.get("puntaje"))
+    if (nuevo_restaurante, nuevo_puntaje) != (anterior["restaurante_id"], anterior.get("puntaje")):
+        await ajustar_calificacion(db, anterior["restaurante_id"], anterior.get("puntaje"), -1)
+        await ajustar_calificacion(db, nuevo_restaurante, nuevo_puntaje, 1)
     return {"mensaje": "Reseña actualizada"}
 
 
 @app.delete("/reseñas/{resena_id}", status_code=204, tags=["Reseñas"])
 async def eliminar_resena(resena_id: str):
-    if db.reseñas.delete_one({"_id": ObjectId(resena_id)}).deleted_count == 0:
+    resena = await db.reseñas.find_one_and_delete({"_id": ObjectId(resena_id)})
+    if not resena:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
+    await ajustar_calificacion(db, resena["restaurante_id"], resena.get("puntaje"), -1)
 
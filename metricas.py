@@ -0,0 +1,250 @@
+"""Métricas de peticiones HTTP y comandos de Mongo, en formato de texto de Prometheus.
+
+- ``MiddlewareMetricas`` mide cada petición (hasta el último byte enviado) y la
+  cuenta por método, plantilla de ruta y código de estado.
+- ``EscuchaMongo`` es un ``CommandListener`` de pymongo: suma cada comando al
+  total global y a la petición que lo originó. La petición actual viaja en una
+  ``ContextVar``, que el threadpool de Starlette copia a sus hilos, así que los
+  comandos que corren vía ``en_hilo`` quedan atribuidos a su petición.
+- Las peticiones más lentas que ``UMBRAL_LENTO_MS`` se registran con la lista
+  de comandos de Mongo que emitieron.
+
+``GET /metrics`` (en main.py) devuelve ``metricas.exponer()``.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+logger = logging.getLogger("metricas")
+
+UMBRAL_LENTO_MS = float(os.environ.get("UMBRAL_LENTO_MS", "500"))
+
+# Límites superiores (segundos) de los histogramas de latencia
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MAX_COMANDOS_LOG = 50
+
+_peticion_actual = ContextVar("peticion_actual", default=None)
+
+
+class Histograma:
+    def __init__(self, limites=LIMITES):
+        self.limites = limites
+        self.cubetas = [0] * len(limites)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor):
+        self.suma += valor
+        self.cuenta += 1
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.cubetas[i] += 1
+                break
+
+
+class Peticion:
+    """Comandos de Mongo emitidos durante una petición HTTP."""
+
+    __slots__ = ("comandos",)
+
+    def __init__(self):
+        self.comandos = []  # (comando, colección, segundos, ok)
+
+    def duracion_mongo(self):
+        return sum(c[2] for c in self.comandos)
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = {}        # (método, ruta, estado) -> n
+        self.duraciones = {}        # (método, ruta) -> Histograma
+        self.mongo_por_ruta = {}    # (método, ruta) -> [comandos, segundos]
+        self.comandos = {}          # (comando, colección) -> [n, segundos, fallos]
+        self.servidores = {}        # (servidor, comando) -> n
+
+    def registrar_peticion(self, metodo, ruta, estado, segundos, peticion):
+        with self._lock:
+            clave = (metodo, ruta, str(estado))
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+            if segundos is not None:
+                self.duraciones.setdefault((metodo, ruta), Histograma()).observar(segundos)
+            acumulado = self.mongo_por_ruta.setdefault((metodo, ruta), [0, 0.0])
+            acumulado[0] += len(peticion.comandos)
+            acumulado[1] += peticion.duracion_mongo()
+
+    def registrar_comando(self, comando, coleccion, segundos, ok, servidor=""):
+        with self._lock:
+            self.servidores[(servidor, comando)] = self.servidores.get((servidor, comando), 0) + 1
+            acumulado = self.comandos.setdefault((comando, coleccion), [0, 0.0, 0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+            if not ok:
+                acumulado[2] += 1
+
+    def exponer(self, extras=()):
+        """Texto en formato de exposición de Prometheus (0.0.4).
+
+        ``extras`` son tuplas ``(nombre, tipo, ayuda, valor)`` sin etiquetas.
+        """
+        with self._lock:
+            lineas = []
+
+            def cabecera(nombre, tipo, ayuda):
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+
+            cabecera("http_peticiones_total", "counter", "Peticiones HTTP por ruta y estado.")
+            for (metodo, ruta, estado), n in sorted(self.peticiones.items()):
+                lineas.append(
+                    f"http_peticiones_total{_etiquetas(metodo=metodo, ruta=ruta, estado=estado)} {n}"
+                )
+
+            cabecera("http_duracion_segundos", "histogram", "Latencia de las peticiones HTTP.")
+            for (metodo, ruta), h in sorted(self.duraciones.items()):
+                acumulado = 0
+                for limite, n in zip(h.limites, h.cubetas):
+                    acumulado += n
+                    lineas.append(
+                        f"http_duracion_segundos_bucket"
+                        f"{_etiquetas(metodo=metodo, ruta=ruta, le=repr(limite))} {acumulado}"
+                    )
+                base = _etiquetas(metodo=metodo, ruta=ruta)
+                lineas.append(
+                    f"http_duracion_segundos_bucket{_etiquetas(metodo=metodo, ruta=ruta, le='+Inf')} {h.cuenta}"
+                )
+                lineas.append(f"http_duracion_segundos_sum{base} {h.suma:.6f}")
+                lineas.append(f"http_duracion_segundos_count{base} {h.cuenta}")
+
+            cabecera("http_mongo_comandos_total", "counter", "Comandos de Mongo emitidos por ruta.")
+            for (metodo, ruta), (n, _) in sorted(self.mongo_por_ruta.items()):
+                lineas.append(f"http_mongo_comandos_total{_etiquetas(metodo=metodo, ruta=ruta)} {n}")
+            cabecera("http_mongo_segundos_total", "counter", "Tiempo en comandos de Mongo por ruta.")
+            for (metodo, ruta), (_, s) in sorted(self.mongo_por_ruta.items()):
+                lineas.append(f"http_mongo_segundos_total{_etiquetas(metodo=metodo, ruta=ruta)} {s:.6f}")
+
+            cabecera("mongo_comandos_total", "counter", "Comandos de Mongo por tipo y colección.")
+            for (comando, coleccion), (n, _, _) in sorted(self.comandos.items()):
+                lineas.append(f"mongo_comandos_total{_etiquetas(comando=comando, coleccion=coleccion)} {n}")
+            cabecera("mongo_comandos_segundos_total", "counter", "Tiempo en comandos de Mongo.")
+            for (comando, coleccion), (_, s, _) in sorted(self.comandos.items()):
+                lineas.append(
+                    f"mongo_comandos_segundos_total{_etiquetas(comando=comando, coleccion=coleccion)} {s:.6f}"
+                )
+            cabecera("mongo_comandos_fallidos_total", "counter", "Comandos de Mongo que fallaron.")
+            for (comando, coleccion), (_, _, f) in sorted(self.comandos.items()):
+                lineas.append(
+                    f"mongo_comandos_fallidos_total{_etiquetas(comando=comando, coleccion=coleccion)} {f}"
+                )
+            cabecera("mongo_comandos_servidor_total", "counter", "Comandos de Mongo por nodo que los atendió.")
+            for (servidor, comando), n in sorted(self.servidores.items()):
+                lineas.append(
+                    f"mongo_comandos_servidor_total{_etiquetas(servidor=servidor, comando=comando)} {n}"
+                )
+
+        for nombre, tipo, ayuda, valor in extras:
+            cabecera(nombre, tipo, ayuda)
+            lineas.append(f"{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+def _etiquetas(**valores):
+    partes = []
+    for clave, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+metricas = Metricas()
+
+
+class EscuchaMongo(monitoring.CommandListener):
+    """Atribuye cada comando de Mongo a la petición HTTP en curso (si la hay)."""
+
+    def __init__(self):
+        self._colecciones = {}  # (conexión, request_id) -> colección, entre started y succeeded
+
+    def started(self, event):
+        coleccion = event.command.get(event.command_name)
+        if not isinstance(coleccion, str):
+            coleccion = ""
+        self._colecciones[(event.connection_id, event.request_id)] = coleccion
+
+    def _terminar(self, event, ok):
+        coleccion = self._colecciones.pop((event.connection_id, event.request_id), "")
+        segundos = event.duration_micros / 1e6
+        host, puerto = event.connection_id
+        metricas.registrar_comando(event.command_name, coleccion, segundos, ok, f"{host}:{puerto}")
+        peticion = _peticion_actual.get()
+        if peticion is not None:
+            peticion.comandos.append((event.command_name, coleccion, segundos, ok))
+
+    def succeeded(self, event):
+        self._terminar(event, True)
+
+    def failed(self, event):
+        self._terminar(event, False)
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI: latencia por ruta, códigos de estado y log de peticiones lentas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        peticion = Peticion()
+        token = _peticion_actual.set(peticion)
+        estado = 500
+        stream = False
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            nonlocal estado, stream
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                stream = any(
+                    k == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in mensaje.get("headers", ())
+                )
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            segundos = time.perf_counter() - inicio
+            _peticion_actual.reset(token)
+            # El router deja la ruta que atendió la petición en el scope; se usa
+            # su plantilla para no crear una serie por cada id.
+            ruta = scope.get("route")
+            ruta = getattr(ruta, "path", None) or "sin_ruta"
+            # Las conexiones SSE duran lo que el cliente quiera: solo se cuentan
+            metricas.registrar_peticion(
+                scope["method"], ruta, estado, None if stream else segundos, peticion
+            )
+            if not stream and segundos * 1000 >= UMBRAL_LENTO_MS:
+                _log_lenta(scope, ruta, estado, segundos, peticion)
+
+
+def _log_lenta(scope, ruta, estado, segundos, peticion):
+    comandos = ", ".join(
+        f"{comando}{'@' + coleccion if coleccion else ''} {s * 1000:.1f}ms{'' if ok else ' (falló)'}"
+        for comando, coleccion, s, ok in peticion.comandos[:MAX_COMANDOS_LOG]
+    )
+    if len(peticion.comandos) > MAX_COMANDOS_LOG:
+        comandos += f", … {len(peticion.comandos) - MAX_COMANDOS_LOG} más"
+    logger.warning(
+        "Petición lenta: %s %s (%s) %d en %.1f ms; Mongo: %d comandos, %.1f ms [%s]",
+        scope["method"], scope.get("path"), ruta, estado, segundos * 1000,
+        len(peticion.comandos), peticion.duracion_mongo() * 1000, comandos,
+    )
@@ -0,0 +1,73 @@
+"""Paginación por cursor (keyset) para los endpoints de listado.
+
+En lugar de ``skip``, cada página continúa a partir de la clave de ordenamiento
+y el ``_id`` del último documento entregado, así que la página N cuesta lo
+mismo que la primera. El cursor es opaco para el cliente: un JSON en base64
+que también guarda el campo y la dirección de ordenamiento para rechazar
+cursores usados con otro ``sort``.
+
+El siguiente cursor se devuelve en el encabezado ``X-Next-Cursor`` para que el
+cuerpo de los listados siga siendo la misma lista de siempre.
+"""
+
+import base64
+from datetime import datetime
+
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+ENCABEZADO_CURSOR = "X-Next-Cursor"
+
+# Lo único que puede traer un cursor como valor: un dict (p. ej. {"$ne": ...})
+# se volvería un operador al armar el filtro
+_TIPOS_VALOR = (type(None), bool, int, float, str, datetime, ObjectId)
+
+
+def orden_keyset(campo, direccion):
+    """Ordenamiento por ``campo`` con ``_id`` como desempate en la misma dirección."""
+    if campo == "_id":
+        return [("_id", direccion)]
+    return [(campo, direccion), ("_id", direccion)]
+
+
+def codificar_cursor(doc, orden):
+    campo, direccion = orden[0]
+    datos = {"c": campo, "d": direccion, "v": doc.get(campo), "id": doc["_id"]}
+    return base64.urlsafe_b64encode(json_util.dumps(datos).encode()).decode()
+
+
+def filtro_con_cursor(filtro, cursor, orden):
+    """Combina ``filtro`` con la condición "después del cursor" para ``orden``."""
+    try:
+        datos = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        campo, direccion, valor, ultimo_id = datos["c"], datos["d"], datos["v"], datos["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if (campo, direccion) != tuple(orden[0]):
+        raise HTTPException(status_code=400, detail="El cursor no corresponde a este ordenamiento")
+    if not isinstance(valor, _TIPOS_VALOR) or not isinstance(ultimo_id, _TIPOS_VALOR):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    op = "$gt" if direccion == ASCENDING else "$lt"
+    if campo == "_id":
+        despues = {"_id": {op: ultimo_id}}
+    else:
+        # Mongo ordena null/ausente antes que cualquier valor: al principio en
+        # orden ascendente y al final en descendente. $gt/$lt nunca coinciden
+        # con null, así que esos documentos se alcanzan con cláusulas propias.
+        despues = {"$or": [{campo: valor, "_id": {op: ultimo_id}}]}
+        if valor is None:
+            if direccion == ASCENDING:
+                despues["$or"].append({campo: {"$ne": None}})
+        else:
+            despues["$or"].append({campo: {op: valor}})
+            if direccion != ASCENDING:
+                despues["$or"].append({campo: None})
+    return {"$and": [filtro, despues]} if filtro else despues
+
+
+def poner_siguiente_cursor(response, docs, orden, limite):
+    """Agrega ``X-Next-Cursor`` si la página vino llena (puede haber más)."""
+    if docs and limite and len(docs) >= limite:
+        response.headers[ENCABEZADO_CURSOR] = codificar_cursor(docs[-1], orden)
@@ -0,0 +1,186 @@
+"""Nombres copiados en las órdenes y su propagación en segundo plano.
+
+Cada orden guarda ``restaurante_nombre`` y el ``nombre`` de cada artículo del
+pedido, copiados al crearla, así que listarlas no consulta ``restaurantes`` ni
+``articulos``. Cuando ``actualizar_restaurante`` o ``actualizar_articulo``
+cambian un nombre avisan a ``propagador``, que corrige las órdenes en lotes de
+``PROPAGACION_LOTE`` desde una tarea del event loop, fuera de la petición.
+
+El aviso solo lleva el id: el nombre se lee al propagar. Varios renombres
+seguidos se reducen a una pasada y, si dos workers propagan a la vez, las
+órdenes terminan con el nombre vigente. Los avisos pendientes se pierden si el
+proceso se detiene, y una orden creada durante un renombre puede quedar con el
+nombre anterior; ambos casos (y las órdenes anteriores a estos campos) se
+corrigen con:
+
+    python propagacion.py --uri mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from contextlib import suppress
+
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = int(os.environ.get("PROPAGACION_LOTE", "500"))
+
+SIN_NOMBRE = "Desconocido"
+
+
+def nombre_de(documento):
+    return documento["nombre"] if documento and documento.get("nombre") else SIN_NOMBRE
+
+
+def _filtro_restaurante(restaurante_id, nombre):
+    return {"restaurante_id": restaurante_id, "restaurante_nombre": {"$ne": nombre}}
+
+
+def _filtro_articulo(articulo_id, nombre):
+    return {"pedido": {"$elemMatch": {"articuloId": articulo_id, "nombre": {"$ne": nombre}}}}
+
+
+def _cambios_articulo(articulo_id, nombre):
+    return {"$set": {"pedido.$[item].nombre": nombre}}, [{"item.articuloId": articulo_id}]
+
+
+async def _por_lotes(ordenes, filtro, cambios, array_filters=None, tamano_lote=TAMANO_LOTE):
+    """Aplica ``cambios`` a las órdenes de ``filtro`` de a ``tamano_lote`` por vez.
+
+    ``filtro`` deja de coincidir con una orden ya corregida, así que cada
+    vuelta toma las siguientes sin llevar un cursor abierto.
+    """
+    total = 0
+    while True:
+        lote = await ordenes.find(filtro, projection={"_id": 1}, limit=tamano_lote)
+        if not lote:
+            return total
+        resultado = await ordenes.update_many(
+            {"_id": {"$in": [o["_id"] for o in lote]}}, cambios, array_filters=array_filters
+        )
+        total += resultado.modified_count
+
+
+async def propagar_restaurante(db, restaurante_id):
+    """Copia el nombre vigente del restaurante a sus órdenes; devuelve cuántas cambió."""
+    restaurante = await db.restaurantes.find_one({"_id": restaurante_id}, {"nombre": 1})
+    if restaurante is None:
+        return 0  # borrado: las órdenes conservan el último nombre
+    nombre = nombre_de(restaurante)
+    return await _por_lotes(
+        db.ordenes, _filtro_restaurante(restaurante_id, nombre), {"$set": {"restaurante_nombre": nombre}}
+    )
+
+
+async def propagar_articulo(db, articulo_id):
+    """Copia el nombre vigente del artículo a los pedidos que lo incluyen."""
+    articulo = await db.articulos.find_one({"_id": articulo_id}, {"nombre": 1})
+    if articulo is None:
+        return 0
+    nombre = nombre_de(articulo)
+    cambios, array_filters = _cambios_articulo(articulo_id, nombre)
+    return await _por_lotes(db.ordenes, _filtro_articulo(articulo_id, nombre), cambios, array_filters)
+
+
+_PROPAGAR = {"restaurantes": propagar_restaurante, "articulos": propagar_articulo}
+
+
+class PropagadorNombres:
+    def __init__(self):
+        self._pendientes = {}  # (colección, _id) -> None, en orden de llegada
+        self._evento = None
+        self._tarea = None
+        self._db = None
+
+    # -- ciclo de vida -----------------------------------------------------
+
+    def iniciar(self, db):
+        """Arranca la tarea de propagación; llamar desde el event loop."""
+        self._db = db
+        self._evento = asyncio.Event()
+        if self._pendientes:
+            self._evento.set()
+        self._tarea = asyncio.create_task(self._correr(), name="propagador-nombres")
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._tarea
+            self._tarea = None
+
+    # -- avisos ------------------------------------------------------------
+
+    def restaurante_renombrado(self, restaurante_id):
+        self._encolar("restaurantes", restaurante_id)
+
+    def articulo_renombrado(self, articulo_id):
+        self._encolar("articulos", articulo_id)
+
+    def _encolar(self, coleccion, _id):
+        self._pendientes[(coleccion, _id)] = None
+        if self._evento is not None:
+            self._evento.set()
+
+    def total_pendientes(self):
+        return len(self._pendientes)
+
+    async def _correr(self):
+        while True:
+            await self._evento.wait()
+            self._evento.clear()
+            while self._pendientes:
+                # Se saca antes de propagar: un renombre que llegue mientras
+                # tanto vuelve a encolar el id y se hace otra pasada
+                coleccion, _id = clave = next(iter(self._pendientes))
+                del self._pendientes[clave]
+                try:
+                    cambiadas = await _PROPAGAR[coleccion](self._db, _id)
+                except Exception:
+                    logger.exception("No se pudo propagar el nombre de %s %s", coleccion, _id)
+                    continue
+                if cambiadas:
+                    logger.info("Nombre de %s %s propagado a %d órdenes", coleccion, _id, cambiadas)
+
+
+propagador = PropagadorNombres()
+
+
+def completar(db):
+    """Copia los nombres vigentes a todas las órdenes (para datos existentes)."""
+    totales = {"restaurantes": 0, "articulos": 0}
+    for restaurante in db.restaurantes.find({}, {"nombre": 1}):
+        nombre = nombre_de(restaurante)
+        totales["restaurantes"] += db.ordenes.update_many(
+            _filtro_restaurante(restaurante["_id"], nombre), {"$set": {"restaurante_nombre": nombre}}
+        ).modified_count
+    # Órdenes de restaurantes que ya no existen
+    totales["restaurantes"] += db.ordenes.update_many(
+        {"restaurante_nombre": {"$exists": False}}, {"$set": {"restaurante_nombre": SIN_NOMBRE}}
+    ).modified_count
+
+    for articulo in db.articulos.find({}, {"nombre": 1}):
+        nombre = nombre_de(articulo)
+        cambios, array_filters = _cambios_articulo(articulo["_id"], nombre)
+        totales["articulos"] += db.ordenes.update_many(
+            _filtro_articulo(articulo["_id"], nombre), cambios, array_filters=array_filters
+        ).modified_count
+    return totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copia los nombres vigentes a las órdenes existentes.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="Proyecto")
+    args = parser.parse_args()
+
+    totales = completar(MongoClient(args.uri)[args.db])
+    print(f"  restaurante_nombre : {totales['restaurantes']:,} órdenes actualizadas")
+    print(f"  nombres de artículo: {totales['articulos']:,} órdenes actualizadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,9 @@ interface Articulo {
   imagen_id?: string;
 }
 
+// El detalle devuelve el menú por páginas (ver obtener_restaurante_con_articulos)
+const ARTICULOS_POR_PAGINA = 50;
+
 interface ItemPedido {
   articuloId: string;
   nombre: string;
@@ -46,6 +49,7 @@ const Restaurante = () => {
   const [restaurante, setRestaurante] = useState<RestauranteData | null>(null);
   const [resenas, setResenas] = useState<Resena[]>([]);
   const [articulos, setArticulos] = useState<Articulo[]>([]);
+  const [totalArticulos, setTotalArticulos] = useState(0);
   const [pedido, setPedido] = useState<ItemPedido[]>([]);
 
   useEffect(() => {
@@ -53,11 +57,14 @@ const Restaurante = () => {
     console.warn("ID Restaurante:", id);
     if (!id) return;
 
-    fetch(`http://localhost:8000/restaurantes/${id}/detalle`)
+    fetch(
+      `http://localhost:8000/restaurantes/${id}/detalle?limite=${ARTICULOS_POR_PAGINA}`
+    )
       .then((res) => res.json())
       .then((data) => {
         setRestaurante(data.restaurante);
         setArticulos(data.articulos);
+        setTotalArticulos(data.total);
       })
       .catch((err) => {
         console.error("Error al cargar restaurante y artículos:", err);
@@ -69,6 +76,19 @@ const Restaurante = () => {
       .catch((err) => console.error("Error al cargar reseñas:", err));
   }, [id]);
 
+  const cargarMasArticulos = async () => {
+    try {
+      const res = await fetch(
+        `http://localhost:8000/restaurantes/${id}/detalle?skip=${articulos.length}&limite=${ARTICULOS_POR_PAGINA}`
+      );
+      const data = await res.json();
+      setArticulos((prev) => [...prev, ...data.articulos]);
+      setTotalArticulos(data.total);
+    } catch (err) {
+      console.error("Error al cargar más artículos:", err);
+    }
+  };
+
   const enviarResena = async (e: React.FormEvent) => {
     e.preventDefault();
     const loginInfo = localStorage.getItem("loginInfo");
@@ -234,6 +254,11 @@ const Restaurante = () => {
               ))}
             </div>
           )}
+          {articulos.length < totalArticulos && (
+            <button onClick={cargarMasArticulos}>
+              Ver más artículos ({totalArticulos - articulos.length})
+            </button>
+          )}
         </div>
 
         <div className="pedido-column">
@@ -0,0 +1,57 @@
+"""Serialización directa de documentos BSON a JSON.
+
+Los documentos de Mongo se escriben a bytes en una sola pasada: ``ObjectId``
+pasa a ``str`` y ``datetime`` a ISO 8601 durante el propio volcado, sin copiar
+el documento antes ni pasar por ``jsonable_encoder``. Usa ``orjson`` si está
+instalado y, si no, el ``json`` de la biblioteca estándar con el mismo
+``default``.
+
+Los endpoints que devuelven documentos retornan ``RespuestaJSON(doc)`` para que
+FastAPI no vuelva a recorrer el resultado.
+"""
+
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+def _convertir(valor):
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal128):
+        return float(valor.to_decimal())
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    raise TypeError(f"Tipo no serializable a JSON: {type(valor).__name__}")
+
+
+if orjson is not None:
+
+    def a_json(contenido):
+        """Serializa ``contenido`` (documentos, listas, dicts) a bytes JSON."""
+        return orjson.dumps(contenido, default=_convertir, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+
+    def a_json(contenido):
+        """Serializa ``contenido`` (documentos, listas, dicts) a bytes JSON."""
+        return json.dumps(
+            contenido, default=_convertir, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    """``JSONResponse`` que entiende tipos BSON y serializa en una sola pasada."""
+
+    def render(self, contenido) -> bytes:
+        return a_json(contenido)
@@ -0,0 +1,174 @@
+"""Recepción en streaming del multipart de ``POST /restaurantes/{id}/menu/lote``.
+
+``request.form()`` de Starlette lee el cuerpo completo antes de que corra el
+endpoint y deja cada archivo en un temporal (hasta 1 MB en memoria). Aquí cada
+imagen se escribe a GridFS a medida que llegan sus bytes, así que la petición
+retiene a lo sumo un chunk de GridFS (255 KB) y el bloque que entrega el
+servidor, sin importar cuántas imágenes traiga el lote.
+
+El formulario de AgregarProductos manda una parte por producto y, si el
+producto no tiene imagen, un Blob vacío (``filename="blob"``). Esas partes no
+crean archivo ni cuentan para ``MAX_IMAGENES_LOTE``.
+"""
+
+import os
+
+from fastapi import HTTPException
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from datos import en_hilo
+
+MAX_IMAGENES_LOTE = int(os.environ.get("MAX_IMAGENES_LOTE", "100"))
+MAX_BYTES_LOTE_IMAGENES = int(float(os.environ.get("MAX_LOTE_IMAGENES_MB", "200")) * 1024 * 1024)
+MAX_BYTES_CAMPO = 1024 * 1024
+
+SIN_IMAGEN = "blob"  # nombre que el navegador da a un Blob sin nombre
+
+
+def _demasiado_grande():
+    return HTTPException(
+        status_code=413,
+        detail=f"El lote supera {MAX_BYTES_LOTE_IMAGENES // (1024 * 1024)} MB",
+    )
+
+
+class _Parte:
+    def __init__(self, encabezados):
+        _, opciones = parse_options_header(encabezados.get(b"content-disposition", b""))
+        if b"name" not in opciones:
+            raise HTTPException(status_code=400, detail="Parte del formulario sin nombre")
+        self.nombre = opciones[b"name"].decode("utf-8", "replace")
+        archivo = opciones.get(b"filename")
+        self.archivo = archivo.decode("utf-8", "replace") if archivo is not None else None
+        tipo = encabezados.get(b"content-type")
+        self.content_type = tipo.decode("latin-1") if tipo else None
+        self.datos = bytearray()
+        self.grid_in = None
+
+
+class LoteImagenes:
+    """Parsea el multipart y sube a GridFS las partes ``campo_imagenes``.
+
+    ``campos`` queda con los campos de texto e ``imagen_ids`` con un id (o
+    ``None`` si la parte venía vacía) por cada parte de imagen, en orden.
+    """
+
+    def __init__(self, grid, campo_imagenes="imagenes"):
+        self.grid = grid
+        self.campo_imagenes = campo_imagenes
+        self.campos = {}
+        self.imagen_ids = []
+        self._subidas = 0
+        self._eventos = []
+        self._encabezados = {}
+        self._encabezado = [b"", b""]
+        self._parte = None
+
+    # -- callbacks del parser (síncronos; solo encolan) ---------------------
+
+    def _on_header_field(self, datos, inicio, fin):
+        self._encabezado[0] += datos[inicio:fin]
+
+    def _on_header_value(self, datos, inicio, fin):
+        self._encabezado[1] += datos[inicio:fin]
+
+    def _on_header_end(self):
+        nombre, valor = self._encabezado
+        self._encabezados[nombre.lower()] = valor
+        self._encabezado = [b"", b""]
+
+    def _on_headers_finished(self):
+        self._eventos.append(("inicio", self._encabezados))
+        self._encabezados = {}
+
+    def _on_part_data(self, datos, inicio, fin):
+        self._eventos.append(("datos", bytes(datos[inicio:fin])))
+
+    def _on_part_end(self):
+        self._eventos.append(("fin", None))
+
+    # -- procesamiento (async; escribe a GridFS en el threadpool) -----------
+
+    async def _procesar(self):
+        eventos, self._eventos = self._eventos, []
+        for tipo, valor in eventos:
+            if tipo == "inicio":
+                self._parte = _Parte(valor)
+            elif tipo == "datos":
+                await self._datos(self._parte, valor)
+            else:
+                await self._fin(self._parte)
+                self._parte = None
+
+    async def _datos(self, parte, datos):
+        if parte.archivo is None:
+            if len(parte.datos) + len(datos) > MAX_BYTES_CAMPO:
+                raise HTTPException(status_code=413, detail=f"El campo {parte.nombre} es demasiado grande")
+            parte.datos.extend(datos)
+            return
+        if parte.nombre != self.campo_imagenes or parte.archivo == SIN_IMAGEN or not datos:
+            return
+        if parte.grid_in is None:
+            self._subidas += 1
+            if self._subidas > MAX_IMAGENES_LOTE:
+                raise HTTPException(
+                    status_code=413, detail=f"Máximo {MAX_IMAGENES_LOTE} imágenes por lote"
+                )
+            parte.grid_in = await en_hilo(
+                self.grid.new_file, filename=parte.archivo, content_type=parte.content_type
+            )
+        await en_hilo(parte.grid_in.write, datos)
+
+    async def _fin(self, parte):
+        if parte.archivo is None:
+            self.campos[parte.nombre] = parte.datos.decode("utf-8", "replace")
+        elif parte.nombre == self.campo_imagenes:
+            if parte.grid_in is None:
+                self.imagen_ids.append(None)
+            else:
+                await en_hilo(parte.grid_in.close)
+                self.imagen_ids.append(parte.grid_in._id)
+
+    async def descartar(self):
+        """Borra lo que ya se subió (y los chunks de una imagen a medias)."""
+        if self._parte is not None and self._parte.grid_in is not None:
+            await en_hilo(self._parte.grid_in.abort)
+        for imagen_id in self.imagen_ids:
+            if imagen_id is not None:
+                await en_hilo(self.grid.delete, imagen_id)
+        self.imagen_ids = []
+
+    async def recibir(self, request):
+        longitud = request.headers.get("content-length", "")
+        if longitud.isdigit() and int(longitud) > MAX_BYTES_LOTE_IMAGENES:
+            raise _demasiado_grande()  # se rechaza sin leer el cuerpo
+        _, opciones = parse_options_header(request.headers.get("content-type", ""))
+        if b"boundary" not in opciones:
+            raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+
+        parser = MultipartParser(opciones[b"boundary"], {
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        leidos = 0
+        try:
+            async for bloque in request.stream():
+                leidos += len(bloque)
+                if leidos > MAX_BYTES_LOTE_IMAGENES:
+                    raise _demasiado_grande()
+                parser.write(bloque)
+                await self._procesar()
+            parser.finalize()
+            await self._procesar()
+        except FormParserError:
+            await self.descartar()
+            raise HTTPException(status_code=400, detail="Multipart inválido")
+        except BaseException:
+            await self.descartar()
+            raise
+        return self
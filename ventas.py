@@ -0,0 +1,195 @@
+"""Resumen diario de ventas por restaurante, mantenido de forma incremental.
+
+La colección ``ventas_diarias`` guarda un documento por restaurante, día (UTC)
+y estado de orden con ``ordenes``, ``ingresos`` y ``articulos`` (unidades
+vendidas). Los endpoints de órdenes la ajustan en cada alta, cambio y baja, de
+modo que un reporte de un año lee unos cientos de documentos en lugar de
+todas las órdenes.
+
+Al arrancar, ``conexion.calentar`` lo reconstruye si está vacío (primer
+despliegue sobre órdenes existentes). Si el resumen se desincroniza (cargas
+directas a Mongo, fallos a mitad de una escritura) se reconstruye desde
+``ordenes``:
+
+    python ventas.py --uri mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+
+CAMPOS = ("ordenes", "ingresos", "articulos")
+
+
+def dia_de(fecha):
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+
+def _clave(orden):
+    return (orden.get("restaurante_id"), dia_de(orden["fecha"]), orden.get("estado"))
+
+
+def _operaciones(deltas):
+    operaciones = []
+    for (restaurante_id, dia, estado), valores in deltas.items():
+        if not any(valores):
+            continue
+        operaciones.append(UpdateOne(
+            {"restaurante_id": restaurante_id, "dia": dia, "estado": estado},
+            {"$inc": dict(zip(CAMPOS, valores))},
+            upsert=True,
+        ))
+    return operaciones
+
+
+async def ajustar_ventas(db, quitar=(), agregar=()):
+    """Resta las órdenes de ``quitar`` y suma las de ``agregar`` en un solo ``bulk_write``.
+
+    Las órdenes son documentos con ``restaurante_id``, ``fecha``, ``estado``,
+    ``total`` y ``pedido``. Para un cambio se pasa el documento anterior en
+    ``quitar`` y el nuevo en ``agregar``.
+    """
+    deltas = {}
+    for signo, ordenes in ((-1, quitar), (1, agregar)):
+        for orden in ordenes:
+            if orden.get("fecha") is None:
+                continue
+            valores = deltas.setdefault(_clave(orden), [0, 0, 0])
+            valores[0] += signo
+            valores[1] += signo * (orden.get("total") or 0)
+            valores[2] += signo * sum(i.get("cantidad", 0) for i in orden.get("pedido") or [])
+    operaciones = _operaciones(deltas)
+    if operaciones:
+        await db.ventas_diarias.bulk_write(operaciones, ordered=False)
+
+
+def _pipeline_resumen(filtro):
+    return [
+        {"$match": filtro},
+        {
+            "$group": {
+                "_id": {
+                    "restaurante_id": "$restaurante_id",
+                    "dia": {"$dateTrunc": {"date": "$fecha", "unit": "day"}},
+                    "estado": "$estado",
+                },
+                "ordenes": {"$sum": 1},
+                "ingresos": {"$sum": "$total"},
+                "articulos": {"$sum": {"$sum": "$pedido.cantidad"}},
+            }
+        },
+    ]
+
+
+# Lo que ajustar_ventas necesita de cada orden
+PROYECCION_VENTAS = {"restaurante_id": 1, "fecha": 1, "estado": 1, "total": 1, "pedido.cantidad": 1}
+
+
+ESCRITURAS_CONCURRENTES = int(os.environ.get("VENTAS_ESCRITURAS_CONCURRENTES", "8"))
+
+
+async def _por_orden(operacion, ids):
+    """Aplica ``operacion(_id)`` a cada id con a lo sumo ESCRITURAS_CONCURRENTES a la vez.
+
+    Devuelve los documentos que la operación encontró y el primer error, si lo
+    hubo, para que las órdenes que sí se escribieron igual se ajusten.
+    """
+    limite = asyncio.Semaphore(ESCRITURAS_CONCURRENTES)
+
+    async def una(orden_id):
+        async with limite:
+            return await operacion(orden_id)
+
+    resultados = await asyncio.gather(*(una(i) for i in ids), return_exceptions=True)
+    errores = [r for r in resultados if isinstance(r, BaseException)]
+    documentos = [r for r in resultados if r is not None and not isinstance(r, BaseException)]
+    return documentos, errores[0] if errores else None
+
+
+async def cambiar_estado(db, filtro, estado_actual, nuevo_estado):
+    """Cambia de estado las órdenes de ``filtro`` y mueve en el resumen lo que cambió.
+
+    Cada orden se actualiza con un ``find_one_and_update`` condicionado a
+    ``estado_actual`` que devuelve el documento tal como estaba: una orden que
+    otra escritura ya movió no cuenta, y los importes son los que tenía al
+    cambiar. Devuelve cuántas órdenes cambiaron.
+    """
+    if estado_actual == nuevo_estado:
+        return 0
+    ids = [o["_id"] for o in await db.ordenes.find({**filtro, "estado": estado_actual}, projection={"_id": 1})]
+
+    async def cambiar(orden_id):
+        return await db.ordenes.find_one_and_update(
+            {"_id": orden_id, "estado": estado_actual},
+            {"$set": {"estado": nuevo_estado}},
+            projection=PROYECCION_VENTAS,
+        )
+
+    anteriores, error = await _por_orden(cambiar, ids)
+    await ajustar_ventas(
+        db, quitar=anteriores, agregar=[{**orden, "estado": nuevo_estado} for orden in anteriores]
+    )
+    if error is not None:
+        raise error
+    return len(anteriores)
+
+
+async def borrar_ordenes(db, ids):
+    """Borra las órdenes de ``ids`` y resta del resumen solo las que borró esta llamada.
+
+    Con ``find_one_and_delete`` por id, si dos peticiones borran la misma
+    orden solo una la recibe. Devuelve cuántas se borraron.
+    """
+    async def borrar(orden_id):
+        return await db.ordenes.find_one_and_delete({"_id": orden_id}, projection=PROYECCION_VENTAS)
+
+    borradas, error = await _por_orden(borrar, list(dict.fromkeys(ids)))
+    await ajustar_ventas(db, quitar=borradas)
+    if error is not None:
+        raise error
+    return len(borradas)
+
+
+def reconstruir_ventas(db):
+    """Recalcula toda la colección ``ventas_diarias`` a partir de ``ordenes``."""
+    pipeline = _pipeline_resumen({"fecha": {"$type": "date"}}) + [
+        {
+            "$project": {
+                "_id": 0,
+                "restaurante_id": "$_id.restaurante_id",
+                "dia": "$_id.dia",
+                "estado": "$_id.estado",
+                "ordenes": 1,
+                "ingresos": 1,
+                "articulos": 1,
+            }
+        },
+        {"$out": "ventas_diarias"},
+    ]
+    db.ordenes.aggregate(pipeline)
+    return db.ventas_diarias.count_documents({})
+
+
+def periodo_de(dia, agrupar):
+    if agrupar == "mes":
+        return dia.strftime("%Y-%m")
+    if agrupar == "anio":
+        return dia.strftime("%Y")
+    return dia.strftime("%Y-%m-%d")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el resumen diario de ventas.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="Proyecto")
+    args = parser.parse_args()
+
+    total = reconstruir_ventas(MongoClient(args.uri)[args.db])
+    print(f"Resumen de ventas reconstruido: {total:,} documentos (restaurante × día × estado)")
+
+
+if __name__ == "__main__":
+    main()